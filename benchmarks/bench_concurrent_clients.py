@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Load test the manager's production server with concurrent admin clients.
+
+Starts the app under waitress on a free local port, opens a few long-lived
+terminal streams and ComfyUI readiness long-polls (each holds a server thread),
+then hammers /check_status and /terminal_output from many clients at once and
+reports latency percentiles. With enough server threads the short requests are
+not held up by the long-lived ones.
+
+Usage: python benchmarks/bench_concurrent_clients.py [clients] [requests_per_client] [server_threads]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docker'))
+
+import enhanced_artist_server as server
+from waitress.server import create_server
+
+LONG_LIVED_CLIENTS = 4
+STUB_ARTIST = 'bench-stub'
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else server.MANAGER_THREADS
+
+    workdir = tempfile.mkdtemp(prefix='manager-bench-')
+    server.STATUS_DIR = os.path.join(workdir, 'status')
+    server.OUTPUT_DIR = os.path.join(workdir, 'output')
+    server.ensure_directories()
+    # a registered session whose ComfyUI never finishes starting, so readiness long-polls block
+    stub = server.ArtistSession(STUB_ARTIST, server.COMFYUI_PORT, None)
+    stub.monitor.state = 'starting'
+    server.session_manager.sessions[STUB_ARTIST] = stub
+
+    httpd = create_server(server.app, host='127.0.0.1', port=0, threads=threads)
+    threading.Thread(target=httpd.run, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.effective_port}"
+
+    # Long-lived clients: terminal streams and readiness long-polls
+    for i in range(LONG_LIVED_CLIENTS):
+        def hold(i=i):
+            http = requests.Session()
+            http.post(f"{base}/authenticate", json={'password': 'admin'})
+            if i % 2:
+                with http.get(f"{base}/terminal_stream", stream=True, timeout=300) as response:
+                    for _ in response.iter_lines():
+                        pass
+            else:
+                while True:
+                    http.get(f"{base}/comfyui_status?wait=60&artist={STUB_ARTIST}", timeout=300)
+        threading.Thread(target=hold, daemon=True).start()
+    time.sleep(0.5)
+
+    # Keep the output log busy like a running install
+    def produce():
+        n = 0
+        while True:
+            n += 1
+            server.output_log.put(f"bench line {n}")
+            time.sleep(0.01)
+    threading.Thread(target=produce, daemon=True).start()
+
+    latencies = {'/check_status': [], '/terminal_output': []}
+    lock = threading.Lock()
+
+    def client(index):
+        http = requests.Session()
+        path = '/check_status' if index % 2 else '/terminal_output'
+        samples = []
+        for _ in range(per_client):
+            started = time.perf_counter()
+            response = http.get(base + path, timeout=30)
+            response.raise_for_status()
+            samples.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies[path].extend(samples)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"server threads: {threads}, long-lived clients: {LONG_LIVED_CLIENTS}, short clients: {clients}")
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    for path, samples in latencies.items():
+        print(f"{path:18} p50 {percentile(samples, 0.5):6.1f} ms   p95 {percentile(samples, 0.95):6.1f} ms   max {max(samples):6.1f} ms")
+
+    httpd.close()
+
+if __name__ == '__main__':
+    main()
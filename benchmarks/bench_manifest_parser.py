@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Time the installer script parser on a synthetic 10k-entry catalog.
+
+Usage: python benchmarks/bench_manifest_parser.py [entries]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docker'))
+
+import enhanced_artist_server as server
+
+def synthetic_script(entries):
+    lines = ['#!/bin/bash', 'set -e', '', 'MODELS_DIR="/workspace/ComfyUI/models"', '']
+    for i in range(entries):
+        kind = i % 4
+        if kind == 0:
+            lines.append(f'# Checkpoint {i} (6.5 GB)')
+            lines.append(f'download_model "https://huggingface.co/org/repo{i}/resolve/main/model_{i}.safetensors" "$MODELS_DIR/checkpoints"')
+        elif kind == 1:
+            lines.append(f'# LoRA {i} 144 MB')
+            lines.append(f'wget -c -O models/loras/lora_{i}.safetensors "https://huggingface.co/org/lora{i}/resolve/main/lora_{i}.safetensors"')
+        elif kind == 2:
+            lines.append(f'curl -L "https://example.com/vae_{i}.pt" -o models/vae/vae_{i}.pt  # 320 MB')
+        else:
+            lines.append(f'# Custom node {i}')
+            lines.append(f'git clone --depth 1 https://github.com/org/ComfyUI-node-{i}.git')
+        lines.append('')
+    return '\n'.join(lines)
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    script = synthetic_script(entries)
+
+    started = time.perf_counter()
+    catalog = server.parse_installer_script(script)
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(100):
+        server.parse_installer_script(script)
+    warm = (time.perf_counter() - started) / 100
+
+    print(f"script: {entries} entries, {len(script) / 1024:.0f} KB")
+    print(f"parsed: {len(catalog['models'])} models, {len(catalog['nodes'])} nodes")
+    print(f"cold parse: {cold * 1000:.1f} ms")
+    print(f"memoized:   {warm * 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
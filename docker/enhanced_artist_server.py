@@ -9,30 +9,373 @@ import threading
 import requests
 import signal
 import sys
-import queue
+import re
+import shutil
+import itertools
+import selectors
+import socket
+import logging
+import functools
+import fnmatch
+import tarfile
+import zipfile
+import struct
+import mmap
+import zlib
+import tempfile
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, render_template_string, request, jsonify, session
+from werkzeug.datastructures import ContentRange
+from flask import Flask, Response, render_template_string, request, jsonify, session, g, send_from_directory, url_for
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
+class OutputLog:
+    """Append-only ring buffer of installer output lines.
+
+    Every line gets an increasing sequence number and readers keep their own cursor,
+    so several admin tabs can follow the same output without stealing lines from
+    each other. Only the newest `maxlen` lines are kept in memory; while an install
+    job is open every line is also appended to that job's log file, which can be
+    paged through by byte offset after it has left the ring.
+    """
+
+    def __init__(self, maxlen=5000, log_dir=None, keep_jobs=20, max_line=4096):
+        self.lines = deque(maxlen=maxlen)
+        self.last_seq = 0
+        self.condition = threading.Condition()
+        self.log_dir = log_dir
+        self.keep_jobs = keep_jobs
+        self.max_line = max_line
+        self.job = None
+        self.job_file = None
+
+    def put(self, text):
+        text = str(text)
+        if len(text) > self.max_line:
+            text = text[:self.max_line] + ' …'
+        with self.condition:
+            self.last_seq += 1
+            self.lines.append((self.last_seq, text))
+            if self.job_file:
+                try:
+                    self.job_file.write(text + '\n')
+                except OSError:
+                    pass
+            self.condition.notify_all()
+            return self.last_seq
+
+    def read(self, since=0, limit=None):
+        """(seq, text) pairs newer than since, oldest first"""
+        with self.condition:
+            if not self.lines or since >= self.last_seq:
+                return []
+            start = max(0, since + 1 - self.lines[0][0])
+            stop = None if limit is None else start + limit
+            return list(itertools.islice(self.lines, start, stop))
+
+    def clamp(self, since):
+        """A reader's cursor, reset to the start if it is ahead of this log.
+
+        After a restart the sequence numbers begin again at 1, so a cursor
+        from the previous run would otherwise skip every new line.
+        """
+        with self.condition:
+            return since if 0 <= since <= self.last_seq else 0
+
+    def wait(self, since, timeout):
+        """Block until a line newer than since exists. Returns False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.last_seq > since, timeout)
+
+    def start_job(self, name):
+        """Start spilling output to a new per-job log file. Returns the job id"""
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{re.sub(r'[^A-Za-z0-9_-]', '_', name)}"
+        os.makedirs(self.log_dir, exist_ok=True)
+        with self.condition:
+            self._close_job()
+            self.job = job_id
+            self.job_file = open(self._job_path(job_id), 'a', encoding='utf-8', buffering=1)
+        for old_job in self.jobs()[self.keep_jobs:]:
+            try:
+                os.remove(self._job_path(old_job['job']))
+            except OSError:
+                pass
+        return job_id
+
+    def end_job(self):
+        with self.condition:
+            self._close_job()
+
+    def _close_job(self):
+        if self.job_file:
+            self.job_file.close()
+        self.job = None
+        self.job_file = None
+
+    def _job_path(self, job_id):
+        return os.path.join(self.log_dir, f"{job_id}.log")
+
+    def jobs(self):
+        """Job logs on disk, newest first"""
+        if not self.log_dir or not os.path.isdir(self.log_dir):
+            return []
+        jobs = []
+        for filename in sorted(os.listdir(self.log_dir), reverse=True):
+            if filename.endswith('.log'):
+                job_id = filename[:-4]
+                jobs.append({
+                    'job': job_id,
+                    'size': os.path.getsize(self._job_path(job_id)),
+                    'active': job_id == self.job
+                })
+        return jobs
+
+    def page(self, job_id, offset=0, limit=200):
+        """Read up to limit lines of a job log starting at a byte offset.
+
+        A negative offset counts back from the end of the file, aligned to the
+        next line start, so offset=-65536 pages in the tail of a long log.
+        """
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', job_id):
+            raise ValueError(f"Invalid job id: {job_id}")
+        with open(self._job_path(job_id), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if offset < 0:
+                offset = max(0, size + offset)
+                if offset:
+                    f.seek(offset - 1)
+                    f.readline()
+                    offset = f.tell()
+            f.seek(min(offset, size))
+            lines = []
+            for _ in range(limit):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line.decode('utf-8', 'replace').rstrip('\n'))
+            return {'job': job_id, 'offset': offset, 'next_offset': f.tell(), 'size': size, 'lines': lines}
+
+class Metric:
+    """A Prometheus counter, gauge or histogram, rendered in the text exposition format"""
+
+    def __init__(self, name, documentation, kind, buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+        METRICS.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            # per-bucket counts, then sum and count
+            state = self.values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{_metric_labels(key)} {value}")
+                continue
+            for bound, count in zip(self.buckets, value):
+                lines.append(f"{self.name}_bucket{_metric_labels(key + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_metric_labels(key + (('le', '+Inf'),))} {value[-1]}")
+            lines.append(f"{self.name}_sum{_metric_labels(key)} {value[-2]}")
+            lines.append(f"{self.name}_count{_metric_labels(key)} {value[-1]}")
+        return lines
+
+def _metric_labels(key):
+    if not key:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+METRICS = []
+
 # Global variables
-artist_name = None
-comfyui_process = None
 jupyter_process = None
-session_start_time = None
-comfyui_ready = False
-installation_in_progress = False
-current_process = None
-output_queue = queue.Queue()
 
 # Configuration
+MANAGER_PORT = int(os.environ.get('MANAGER_PORT', '8080'))
+MANAGER_THREADS = int(os.environ.get('MANAGER_THREADS', '32'))
+MANAGER_KEEPALIVE = 120  # seconds an idle keep-alive connection stays open
+MANAGER_CONNECTION_LIMIT = 200
 ADMIN_PASSWORD_HASH = hashlib.sha256('admin'.encode()).hexdigest()
 WORKSPACE_DIR = '/workspace'
 OUTPUT_DIR = f'{WORKSPACE_DIR}/output'
 STATUS_DIR = f'{WORKSPACE_DIR}/.comfyui-status'
-GITHUB_REPO = 'https://github.com/razvanmatei-sf/comfyui-runpod-manager'
+COMFYUI_DIR = f'{WORKSPACE_DIR}/ComfyUI'
+CUSTOM_NODES_DIR = f'{COMFYUI_DIR}/custom_nodes'
+MODELS_DIR = f'{COMFYUI_DIR}/models'
+INSTALLER_REF = os.environ.get('INSTALLER_REF', 'main')  # branch, tag or commit to pull installer scripts from
+GITHUB_RAW = f'https://raw.githubusercontent.com/razvanmatei-sf/comfyui-runpod-manager/{INSTALLER_REF}'
+NODES_SCRIPT = 'installer/install_nodes.sh'
+MODELS_SCRIPT = 'installer/install_models.sh'
+INSTALL_SCRIPTS = {
+    'comfyui': 'installer/install_comfyui.sh',
+    'models': MODELS_SCRIPT,
+    'nodes': NODES_SCRIPT
+}
+COMPONENT_LABELS = {'comfyui': 'ComfyUI', 'models': 'Models', 'nodes': 'Nodes'}
+
+# ComfyUI readiness
+COMFYUI_PORT = 8188  # first session's port; later sessions take the following ports
+COMFYUI_MAX_SESSIONS = int(os.environ.get('COMFYUI_MAX_SESSIONS', '4'))
+COMFYUI_PREWARM = os.environ.get('COMFYUI_PREWARM', '0') == '1'  # keep one idle ComfyUI booted for the next session
+OUTPUT_LINK_DIR = f'{STATUS_DIR}/outputs'  # per-port symlinks ComfyUI writes through
+WARM_OUTPUT_DIR = f'{STATUS_DIR}/warm-output'
+COMFYUI_READY_BANNER = b'To see the GUI go to'
+COMFYUI_PROBE_MIN_DELAY = 0.25
+COMFYUI_PROBE_MAX_DELAY = 5
+COMFYUI_START_TIMEOUT = int(os.environ.get('COMFYUI_START_TIMEOUT', '900'))
+COMFYUI_HEALTH_INTERVAL = 10  # seconds between probes once ComfyUI is up
+COMFYUI_HEALTH_FAILURES = 3  # failed probes in a row before it is reported unresponsive
+
+# Idle shutdown: stop a forgotten pod's processes to save GPU time
+IDLE_TIMEOUT = int(os.environ.get('IDLE_TIMEOUT', '0'))  # seconds without activity; 0 (the default) disables
+IDLE_WARNING = int(os.environ.get('IDLE_WARNING', '600'))  # seconds of notice before stopping
+IDLE_SAMPLE_INTERVAL = 60
+IDLE_STOP_COMMAND = os.environ.get('IDLE_STOP_COMMAND', '')  # e.g. 'runpodctl stop pod $RUNPOD_POD_ID'
+JUPYTER_URL = os.environ.get('JUPYTER_URL', 'http://localhost:8888')
+
+# Artist output catalog
+OUTPUT_SCAN_INTERVAL = int(os.environ.get('OUTPUT_SCAN_INTERVAL', '10'))  # seconds between incremental rescans
+OUTPUT_FULL_RESCAN = 600  # seconds between rescans that also catch files rewritten in place
+OUTPUT_PAGE_LIMIT = 500
+
+# Output thumbnails
+THUMB_CACHE_DIR = f'{STATUS_DIR}/thumbnails'
+THUMB_CACHE_BYTES = int(os.environ.get('THUMB_CACHE_BYTES', str(512 * 1024 * 1024)))
+THUMB_SIZES = (128, 256, 512, 1024)
+THUMB_DEFAULT_SIZE = 256
+THUMB_QUALITY = 80
+THUMB_WORKERS = max(2, (os.cpu_count() or 2) // 2)  # thumbnails rendered at once
+THUMB_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+THUMB_SOURCE_TYPES = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif', '.tif', '.tiff')
+THUMB_MAX_AGE = 3600  # seconds browsers reuse a thumbnail before revalidating its ETag
+
+# Output exports
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# Disk preflight for installs
+MODEL_SIZE_CACHE = f'{STATUS_DIR}/model_sizes.json'
+MODEL_SIZE_TTL = 7 * 24 * 3600  # seconds a HEAD Content-Length is trusted
+PREFLIGHT_CONCURRENCY = 16
+DISK_HEADROOM = int(os.environ.get('DISK_HEADROOM', str(2 * 1024 ** 3)))  # bytes always left free
+DISK_ADMISSION = os.environ.get('DISK_ADMISSION', 'refuse')  # refuse or queue installs that do not fit
+DISK_RECHECK_INTERVAL = 30
+COMFYUI_DISK_ESTIMATE = 8 * 1024 ** 3  # ComfyUI plus its Python environment
+NODE_DISK_ESTIMATE = 200 * 1024 ** 2  # one custom node plus its requirements
+
+# Local-disk hot tier for models on a network volume
+MODEL_TIER_DIR = os.environ.get('MODEL_TIER_DIR', '/var/cache/comfyui-models')
+MODEL_TIER_BYTES = int(os.environ.get('MODEL_TIER_BYTES', '0'))  # local disk budget; 0 disables tiering
+TIER_MIN_USES = int(os.environ.get('TIER_MIN_USES', '2'))  # prompts using a model before it is copied
+TIER_MIN_FREE = 2 * 1024 ** 3  # bytes always left free on the local disk
+TIER_INTERVAL = 60
+TIER_COPY_CHUNK = 16 * 1024 * 1024
+
+# Session start prefetch
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', '1') == '1'
+PREFETCH_MAX_BYTES = int(os.environ.get('PREFETCH_MAX_BYTES', str(64 * 1024 ** 3)))
+PREFETCH_CONCURRENCY = 4
+PREFETCH_CHUNK = 16 * 1024 * 1024
+PREFETCH_RECENT_OUTPUTS = 20  # newest PNG outputs whose embedded prompt is read
+PREFETCH_RECENT_WORKFLOWS = 10  # most recently saved workflows read
+WORKFLOWS_DIR = f'{COMFYUI_DIR}/user/default/workflows'
+
+# Installer manifest cache
+MANIFEST_CACHE_DIR = f'{STATUS_DIR}/manifests'
+MANIFEST_TTL = int(os.environ.get('MANIFEST_TTL', '300'))  # seconds before a background revalidation
+MANIFEST_TIMEOUT = 10
+SCRIPT_CACHE_DIR = f'{STATUS_DIR}/scripts'
+
+# Model downloads
+DOWNLOAD_CONCURRENCY = int(os.environ.get('DOWNLOAD_CONCURRENCY', '3'))  # models in flight at once
+DOWNLOAD_CHUNK_WORKERS = int(os.environ.get('DOWNLOAD_CHUNK_WORKERS', '4'))  # range requests per model
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', str(64 * 1024 * 1024)))
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = (10, 60)  # connect, read
+
+# Installer output: newest lines in memory, every install job's full output on disk
+OUTPUT_LOG_LINES = int(os.environ.get('OUTPUT_LOG_LINES', '5000'))
+JOB_LOG_DIR = f'{STATUS_DIR}/logs'
+JOB_LOG_KEEP = 20
+OUTPUT_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments on /terminal_stream
+
+# Download verification
+QUARANTINE_DIR = f'{WORKSPACE_DIR}/.model-quarantine'  # same volume as models/, so quarantining is a rename
+QUARANTINE_KEEP = 2  # newest bad files kept for inspection; they can be large
+SAFETENSORS_MAX_HEADER = 100 * 1024 * 1024
+MODEL_INVENTORY_CACHE = f'{STATUS_DIR}/model_inventory.json'
+
+# Content-addressed model store, kept on the same volume as models/ so entries can be hardlinks
+BLOB_STORE_DIR = f'{WORKSPACE_DIR}/.model-store'
+BLOB_STORE_MIN_SIZE = 1024 * 1024
+
+# Custom node installs
+NODE_CLONE_CONCURRENCY = int(os.environ.get('NODE_CLONE_CONCURRENCY', '8'))
+NODE_CLONE_TIMEOUT = 300
+
+output_log = OutputLog(OUTPUT_LOG_LINES, JOB_LOG_DIR, JOB_LOG_KEEP)
+
+# Metrics served on /metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+http_request_duration = Metric('manager_http_request_duration_seconds', 'Manager HTTP request latency by route', 'histogram', LATENCY_BUCKETS)
+install_duration = Metric('manager_install_duration_seconds', 'Installation step duration by component', 'histogram', DURATION_BUCKETS)
+download_bytes = Metric('manager_download_bytes_total', 'Model bytes downloaded', 'counter')
+download_throughput = Metric('manager_download_throughput_bytes_per_second', 'Throughput of the last completed download per model', 'gauge')
+download_duration = Metric('manager_download_duration_seconds', 'Model download duration', 'histogram', DURATION_BUCKETS)
+github_fetch_duration = Metric('manager_github_fetch_seconds', 'Installer script fetches from GitHub', 'histogram', LATENCY_BUCKETS)
+comfyui_startup_duration = Metric('manager_comfyui_time_to_ready_seconds', 'Time from ComfyUI spawn until its API answers', 'histogram', DURATION_BUCKETS)
+comfyui_probe_duration = Metric('manager_comfyui_probe_seconds', 'ComfyUI health probe latency', 'histogram', LATENCY_BUCKETS)
+sessions_started = Metric('manager_sessions_started_total', 'Artist sessions started', 'counter')
+active_sessions = Metric('manager_active_sessions', 'Artist sessions with a running ComfyUI', 'gauge')
+prefetch_bytes = Metric('manager_prefetch_bytes_total', 'Model bytes warmed at session start', 'counter')
+prefetch_duration = Metric('manager_prefetch_seconds', 'Time to warm an artist session\'s models', 'histogram', DURATION_BUCKETS)
+
+def timed_install(component=None, mode='script'):
+    """Record an installer's duration and outcome. component defaults to the first argument"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.time()
+            success = False
+            try:
+                success = func(*args, **kwargs)
+                return success
+            finally:
+                install_duration.observe(
+                    time.time() - started,
+                    component=component or args[0],
+                    mode=mode,
+                    result='success' if success else 'failure'
+                )
+        return wrapper
+    return decorator
 
 # Combined interface template
 MAIN_HTML = """
@@ -321,6 +664,12 @@ MAIN_HTML = """
             display: inline;
         }
         
+        .model-problem {
+            color: #e65100;
+            font-size: 0.9em;
+            margin-left: 6px;
+        }
+        
         .checkbox-item.installed {
             background: #e8f5e8;
             border: 1px solid #4caf50;
@@ -533,9 +882,11 @@ MAIN_HTML = """
         let isAuthenticated = false;
         let sessionStartTime = null;
         let timerInterval = null;
-        let checkInterval = null;
+        let idleInterval = null;
+        let idleWarningOpen = false;
         let sessionActive = false;
-        let terminalCheckInterval = null;
+        let comfyPort = 8188;
+        let terminalStream = null;
         
         function handleModeChange() {
             const mode = document.getElementById('mode').value;
@@ -723,7 +1074,16 @@ MAIN_HTML = """
                         modelDiv.innerHTML = `
                             <input type="checkbox" id="model-${model.id}" value="${model.id}" onchange="updateMainModelCheckbox()">
                             <label for="model-${model.id}">${model.name} (${model.size})</label>
+                            <span class="checkmark ${model.installed ? 'installed' : ''}" title="Present and intact on disk">✓</span>
                         `;
+                        if (model.problem) {
+                            // the problem text quotes tensor names from the file itself
+                            const problem = document.createElement('span');
+                            problem.className = 'model-problem';
+                            problem.title = model.problem;
+                            problem.textContent = '⚠ broken, reinstall';
+                            modelDiv.appendChild(problem);
+                        }
                         modelList.appendChild(modelDiv);
                     });
                 } else {
@@ -747,7 +1107,39 @@ MAIN_HTML = """
             }
         }
         
-        function startInstallation() {
+        function formatBytes(bytes) {
+            if (bytes >= 1e9) return (bytes / 1e9).toFixed(1) + ' GB';
+            return Math.round(bytes / 1e6) + ' MB';
+        }
+        
+        async function preflightInstallation(options) {
+            // Show what the install will write and stop here if the volume cannot take it
+            const response = await fetch('/install/preflight', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(options)
+            });
+            const plan = await response.json();
+            if (!plan.success) {
+                alert(plan.message);
+                return false;
+            }
+            
+            const lines = Object.entries(plan.components).map(([component, bytes]) => `  ${component}: ${formatBytes(bytes)}`);
+            const available = Math.max(plan.free_bytes - plan.reserved_bytes - plan.headroom_bytes, 0);
+            let summary = `This installation will write about ${formatBytes(plan.total_bytes)}:\\n${lines.join('\\n')}\\n\\n`;
+            summary += `Available on /workspace: ${formatBytes(available)}`;
+            if (plan.unknown) summary += `\\n${plan.unknown} model(s) have an unknown size`;
+            
+            if (plan.fits) return confirm(summary + '\\n\\nStart the installation?');
+            if (confirm(summary + '\\n\\nThis does not fit. Queue the installation until space is freed?')) {
+                options.on_full = 'queue';
+                return true;
+            }
+            return false;
+        }
+        
+        async function startInstallation() {
             // Get selected individual nodes
             const selectedNodes = [];
             const nodeCheckboxes = document.querySelectorAll('.individual-node input[type="checkbox"]:checked');
@@ -771,6 +1163,10 @@ MAIN_HTML = """
                 return;
             }
             
+            if (!await preflightInstallation(options)) {
+                return;
+            }
+            
             document.getElementById('install-btn').disabled = true;
             document.getElementById('install-btn').textContent = 'Installing...';
             document.getElementById('terminal').innerHTML = '<div class="terminal-line">Starting installation...</div>';
@@ -791,34 +1187,32 @@ MAIN_HTML = """
         }
         
         function startTerminalCheck() {
-            if (terminalCheckInterval) clearInterval(terminalCheckInterval);
+            if (terminalStream) terminalStream.close();
             
-            terminalCheckInterval = setInterval(() => {
-                fetch('/terminal_output')
-                .then(response => response.json())
-                .then(data => {
-                    if (data.output) {
-                        const terminal = document.getElementById('terminal');
-                        const lines = data.output.split('\\n');
-                        lines.forEach(line => {
-                            if (line.trim()) {
-                                const lineDiv = document.createElement('div');
-                                lineDiv.className = 'terminal-line';
-                                lineDiv.textContent = line;
-                                terminal.appendChild(lineDiv);
-                            }
-                        });
-                        terminal.scrollTop = terminal.scrollHeight;
-                    }
-                    
-                    if (data.installation_complete) {
-                        document.getElementById('install-btn').disabled = false;
-                        document.getElementById('install-btn').textContent = 'Start Installation';
-                        checkStatus();
+            // The browser reconnects on its own and resumes from the last event id
+            terminalStream = new EventSource('/terminal_stream');
+            
+            terminalStream.onmessage = (event) => {
+                const terminal = document.getElementById('terminal');
+                event.data.split('\\n').forEach(line => {
+                    if (line.trim()) {
+                        const lineDiv = document.createElement('div');
+                        lineDiv.className = 'terminal-line';
+                        lineDiv.textContent = line;
+                        terminal.appendChild(lineDiv);
                     }
-                })
-                .catch(e => console.error('Terminal check failed:', e));
-            }, 2000);
+                });
+                terminal.scrollTop = terminal.scrollHeight;
+            };
+            
+            terminalStream.addEventListener('status', (event) => {
+                const data = JSON.parse(event.data);
+                if (data.installation_complete) {
+                    document.getElementById('install-btn').disabled = false;
+                    document.getElementById('install-btn').textContent = 'Start Installation';
+                    checkStatus();
+                }
+            });
         }
         
         // Artist mode functions
@@ -842,6 +1236,7 @@ MAIN_HTML = """
             if (result.success) {
                 sessionActive = true;
                 sessionStartTime = new Date();
+                comfyPort = result.port;
                 
                 document.getElementById('startBtn').style.display = 'none';
                 
@@ -859,8 +1254,9 @@ MAIN_HTML = """
                 document.getElementById('comfyLink').classList.add('waiting');
                 document.getElementById('comfyStatus').textContent = ' - Starting...';
                 
-                checkComfyUIStatus();
+                checkComfyUIStatus(artistName);
                 startSessionTimer();
+                startIdleCheck();
             } else {
                 alert('Error: ' + result.message);
                 document.getElementById('startBtn').disabled = false;
@@ -868,26 +1264,43 @@ MAIN_HTML = """
             }
         }
         
-        function checkComfyUIStatus() {
-            checkInterval = setInterval(async () => {
+        async function checkComfyUIStatus(artistName) {
+            // Long-poll: the server holds the request until ComfyUI is up or 30 s pass
+            while (sessionActive) {
+                const polled = Date.now();
                 try {
-                    const response = await fetch('/comfyui_status');
+                    const response = await fetch('/comfyui_status?wait=30&artist=' + encodeURIComponent(artistName));
                     const result = await response.json();
                     
                     if (result.ready) {
                         const runpodId = '{{ runpod_id }}';
-                        const comfyUrl = `https://${runpodId}-8188.proxy.runpod.net`;
+                        const comfyUrl = `https://${runpodId}-${comfyPort}.proxy.runpod.net`;
                         document.getElementById('comfyLink').href = comfyUrl;
                         document.getElementById('comfyLink').classList.remove('waiting');
                         document.getElementById('comfyLink').classList.add('ready');
                         document.getElementById('comfyLink').innerHTML = '<strong>Open ComfyUI</strong>';
                         document.getElementById('comfyLink').target = '_blank';
-                        clearInterval(checkInterval);
+                        return;
+                    }
+                    if (result.state === 'exited' || result.state === 'timeout') {
+                        document.getElementById('comfyStatus').textContent = ' - Failed to start';
+                        return;
+                    }
+                    if (result.state === 'stopped') {
+                        document.getElementById('comfyStatus').textContent = ' - Stopped';
+                        return;
+                    }
+                    if (result.prefetch && result.prefetch.state === 'warming') {
+                        document.getElementById('comfyStatus').textContent = ` - Starting... (warming ${result.prefetch.models.length} models)`;
                     }
                 } catch (e) {
                     console.error('Status check failed:', e);
+                    await new Promise(resolve => setTimeout(resolve, 5000));
                 }
-            }, 5000);
+                // An early answer that is not ready must not turn into a tight loop
+                const early = 2000 - (Date.now() - polled);
+                if (early > 0) await new Promise(resolve => setTimeout(resolve, early));
+            }
         }
         
         function handleComfyClick(event) {
@@ -899,6 +1312,7 @@ MAIN_HTML = """
         }
         
         function startSessionTimer() {
+            if (timerInterval) clearInterval(timerInterval);
             timerInterval = setInterval(() => {
                 if (sessionStartTime) {
                     const elapsed = Math.floor((new Date() - sessionStartTime) / 1000);
@@ -918,6 +1332,46 @@ MAIN_HTML = """
             }, 1000);
         }
         
+        function startIdleCheck() {
+            stopIdleCheck();
+            idleInterval = setInterval(checkIdle, 60000);
+        }
+        
+        function stopIdleCheck() {
+            if (idleInterval) clearInterval(idleInterval);
+            idleInterval = null;
+        }
+        
+        async function checkIdle() {
+            // Ask before the idle monitor stops this pod's ComfyUI and Jupyter
+            if (!sessionActive || idleWarningOpen) return;
+            try {
+                const response = await fetch('/idle_status');
+                const result = await response.json();
+                if (result.state === 'disabled') {
+                    stopIdleCheck();
+                    return;
+                }
+                if (result.state === 'stopped') {
+                    stopIdleCheck();
+                    clearInterval(timerInterval);
+                    sessionActive = false;
+                    document.getElementById('comfyStatus').textContent = ' - Stopped after being idle';
+                    return;
+                }
+                if (result.state !== 'warning') return;
+                idleWarningOpen = true;
+                const minutes = Math.ceil(result.shutdown_in / 60);
+                if (confirm(`This session has been idle and will shut down in ${minutes} min. Keep it running?`)) {
+                    await fetch('/idle_status/keepalive', { method: 'POST' });
+                }
+            } catch (e) {
+                console.error('Idle check failed:', e);
+            } finally {
+                idleWarningOpen = false;
+            }
+        }
+        
         async function terminateRunPod() {
             if (confirm('Are you sure you want to terminate this RunPod instance? All unsaved work will be lost.')) {
                 const btn = event.target;
@@ -953,386 +1407,3071 @@ def ensure_directories():
     Path(STATUS_DIR).mkdir(parents=True, exist_ok=True)
     Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
 
-def get_existing_artists():
-    """Get list of existing artist folders"""
-    artists = []
-    try:
-        if os.path.exists(OUTPUT_DIR):
-            for item in os.listdir(OUTPUT_DIR):
-                if os.path.isdir(os.path.join(OUTPUT_DIR, item)):
-                    if not item.startswith('.') and item != '.ipynb_checkpoints':
-                        artists.append(item)
-            artists.sort()
-    except:
-        pass
-    return artists
+class OutputCatalog:
+    """In-memory index of artist output folders, kept current by incremental rescans.
 
-def parse_nodes_from_script(script_content):
-    """Parse install_nodes.sh script to extract available custom nodes"""
-    import re
-    nodes = []
-    
-    # Look for git clone commands and extract node information
-    git_clone_pattern = r'git clone\s+([^\s]+)\s+([^\s]*)'
-    lines = script_content.split('\n')
-    
-    for i, line in enumerate(lines):
-        # Look for comments that describe nodes or git clone commands
-        if 'git clone' in line:
-            match = re.search(git_clone_pattern, line)
-            if match:
-                repo_url = match.group(1)
-                
-                # Extract node name from URL
-                if 'github.com' in repo_url:
-                    node_name = repo_url.split('/')[-1]
-                    if node_name.endswith('.git'):
-                        node_name = node_name[:-4]
-                    
-                    # Look for comment above for description
-                    description = node_name.replace('-', ' ').replace('_', ' ').title()
-                    if i > 0:
-                        prev_line = lines[i-1].strip()
-                        if prev_line.startswith('#') and not prev_line.startswith('#!/'):
-                            description = prev_line[1:].strip()
-                    
-                    # Create unique ID from node name
-                    node_id = node_name.lower().replace('-', '_').replace(' ', '_')
-                    
-                    nodes.append({
-                        'id': node_id,
-                        'name': description,
-                        'repo_url': repo_url,
-                        'folder_name': node_name
-                    })
-    
-    return nodes
+    A directory's mtime only changes when entries are added to or removed from
+    it, so each rescan stats every known directory and lists only the ones that
+    changed. Files rewritten in place are caught by a full rescan every
+    OUTPUT_FULL_RESCAN seconds. Readers only ever see the in-memory summaries.
+    """
 
-def parse_models_from_script(script_content):
-    """Parse install_models.sh script to extract available models"""
-    import re
-    models = []
-    
-    # Look for wget/curl download commands and extract model information
-    download_patterns = [
-        r'wget\s+.*?-O\s+([^\s]+)\s+"([^"]+)"',  # wget -O filename "url"
-        r'wget\s+"([^"]+)"\s+-O\s+([^\s]+)',     # wget "url" -O filename
-        r'curl\s+.*?-o\s+([^\s]+)\s+"([^"]+)"',  # curl -o filename "url"
-        r'curl\s+"([^"]+)"\s+-o\s+([^\s]+)'      # curl "url" -o filename
-    ]
-    
-    lines = script_content.split('\n')
-    
-    for i, line in enumerate(lines):
-        # Skip comments and empty lines
-        line = line.strip()
-        if not line or line.startswith('#'):
-            continue
-            
-        # Check each download pattern
-        for pattern in download_patterns:
-            match = re.search(pattern, line)
-            if match:
-                if 'wget' in line and '-O' in line:
-                    if line.find('-O') < line.find('"'):
-                        filename = match.group(1)
-                        url = match.group(2)
-                    else:
-                        url = match.group(1)
-                        filename = match.group(2)
-                elif 'curl' in line and '-o' in line:
-                    if line.find('-o') < line.find('"'):
-                        filename = match.group(1)
-                        url = match.group(2)
-                    else:
-                        url = match.group(1)
-                        filename = match.group(2)
-                else:
-                    continue
-                
-                # Extract model info from filename/path
-                model_name = filename.split('/')[-1]  # Get just the filename
-                if model_name.endswith('.safetensors') or model_name.endswith('.ckpt') or model_name.endswith('.pt'):
-                    # Clean up the model name
-                    display_name = model_name.replace('_', ' ').replace('-', ' ')
-                    display_name = display_name.rsplit('.', 1)[0]  # Remove extension
-                    
-                    # Try to extract size info from comment above
-                    size_info = "Unknown size"
-                    if i > 0:
-                        prev_line = lines[i-1].strip()
-                        if prev_line.startswith('#'):
-                            size_match = re.search(r'(\d+\.?\d*\s*[GMK]B)', prev_line, re.IGNORECASE)
-                            if size_match:
-                                size_info = size_match.group(1)
-                    
-                    # Create unique ID from model name
-                    model_id = model_name.lower().replace(' ', '_').replace('-', '_').replace('.', '_')
-                    
-                    models.append({
-                        'id': model_id,
-                        'name': display_name,
-                        'filename': model_name,
-                        'url': url,
-                        'size': size_info
-                    })
-                    break
-    
-    return models
+    def __init__(self, root=OUTPUT_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self.root_mtime = None
+        self.artists = {}  # name -> {'dirs': ..., 'files', 'bytes', 'latest', 'outputs'}
+        self.scanned_at = None
+        self.full_scan_at = 0
 
-def install_individual_nodes(node_ids):
-    """Install specific custom nodes by their IDs"""
-    global installation_in_progress, output_queue
-    
-    try:
-        # First fetch the script to get node information
-        github_url = "https://raw.githubusercontent.com/razvanmatei-sf/comfyui-runpod-manager/main/installer/install_nodes.sh"
-        response = requests.get(github_url, timeout=10)
-        
-        if response.status_code != 200:
-            output_queue.put("Failed to fetch node installation script from GitHub")
-            return False
-        
-        # Parse nodes and filter by selected IDs
-        all_nodes = parse_nodes_from_script(response.text)
-        selected_nodes = [node for node in all_nodes if node['id'] in node_ids]
-        
-        if not selected_nodes:
-            output_queue.put("No valid nodes selected for installation")
-            return False
-        
-        output_queue.put(f"Installing {len(selected_nodes)} custom nodes...")
+    def _scan(self, artist, rel):
+        """List one directory, then any new subdirectories below it"""
+        dirs = artist['dirs']
+        path = os.path.join(self.root, artist['name'], rel)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            entries = list(os.scandir(path))
+        except OSError:
+            self._drop(artist, rel)
+            return
         
-        # Activate virtual environment and install each node
-        for node in selected_nodes:
+        prefix = f"{rel}/" if rel else ''
+        files, subdirs = {}, set()
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
             try:
-                output_queue.put(f"Installing {node['name']}...")
-                
-                # Commands to install the node
-                commands = [
-                    "cd /workspace/ComfyUI",
-                    "source .venv/bin/activate",
-                    f"cd custom_nodes",
-                    f"git clone {node['repo_url']} {node['folder_name']}",
-                    f"cd {node['folder_name']}",
-                    "if [ -f requirements.txt ]; then pip install -r requirements.txt; fi"
-                ]
-                
-                # Execute installation command
-                cmd = " && ".join(commands)
-                process = subprocess.run(
-                    cmd,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=300
-                )
-                
-                if process.returncode == 0:
-                    output_queue.put(f"✓ {node['name']} installed successfully")
-                else:
-                    output_queue.put(f"✗ Failed to install {node['name']}: {process.stderr}")
-                    logging.error(f"Node installation failed: {process.stderr}")
-                    
-            except subprocess.TimeoutExpired:
-                output_queue.put(f"✗ Installation of {node['name']} timed out")
-                return False
-            except Exception as e:
-                output_queue.put(f"✗ Error installing {node['name']}: {str(e)}")
-                logging.error(f"Node installation error: {e}")
-        
-        output_queue.put("Individual node installation completed")
-        return True
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(prefix + entry.name)
+                elif entry.is_file():
+                    st = entry.stat()
+                    files[prefix + entry.name] = (st.st_size, st.st_mtime)
+            except OSError:
+                continue
         
-    except Exception as e:
-        output_queue.put(f"Node installation failed: {str(e)}")
-        logging.error(f"Individual nodes installation error: {e}")
-        return False
+        old = dirs.get(rel)
+        dirs[rel] = {'mtime': mtime, 'files': files, 'subdirs': subdirs}
+        for gone in (old['subdirs'] - subdirs) if old else ():
+            self._drop(artist, gone)
+        for sub in subdirs:
+            if sub not in dirs:
+                self._scan(artist, sub)
 
-def install_individual_models(model_ids):
-    """Install specific models by their IDs"""
-    global installation_in_progress, output_queue
-    
-    try:
-        # First fetch the script to get model information
-        github_url = "https://raw.githubusercontent.com/razvanmatei-sf/comfyui-runpod-manager/main/installer/install_models.sh"
-        response = requests.get(github_url, timeout=10)
-        
-        if response.status_code != 200:
-            output_queue.put("Failed to fetch model installation script from GitHub")
-            return False
-        
-        # Parse models and filter by selected IDs
-        all_models = parse_models_from_script(response.text)
-        selected_models = [model for model in all_models if model['id'] in model_ids]
+    def _drop(self, artist, rel):
+        prefix = f"{rel}/"
+        for key in [k for k in artist['dirs'] if k == rel or k.startswith(prefix)]:
+            del artist['dirs'][key]
+
+    def _refresh_artist(self, artist, full=False):
+        """Rescan an artist's changed directories. Returns True if anything changed"""
+        dirs = artist['dirs']
+        if not dirs:
+            self._scan(artist, '')
+            return True
+        changed = False
+        for rel in list(dirs):
+            if rel not in dirs:
+                continue  # dropped along with its parent
+            try:
+                mtime = os.stat(os.path.join(self.root, artist['name'], rel)).st_mtime_ns
+            except OSError:
+                self._drop(artist, rel)
+                changed = True
+                continue
+            if full or mtime != dirs[rel]['mtime']:
+                self._scan(artist, rel)
+                changed = True
+        return changed
+
+    def _summarize(self, artist):
+        outputs = []
+        for entry in artist['dirs'].values():
+            outputs.extend((path, size, mtime) for path, (size, mtime) in entry['files'].items())
+        outputs.sort(key=lambda o: (-o[2], o[0]))  # newest first
+        return {
+            'files': len(outputs),
+            'bytes': sum(o[1] for o in outputs),
+            'latest': outputs[0][2] if outputs else None,
+            'outputs': outputs
+        }
+
+    def refresh(self):
+        """One incremental rescan of the output tree"""
+        full = time.time() - self.full_scan_at >= OUTPUT_FULL_RESCAN
+        try:
+            root_mtime = os.stat(self.root).st_mtime_ns
+        except OSError:
+            return
         
-        if not selected_models:
-            output_queue.put("No valid models selected for installation")
-            return False
+        names = set(self.artists)
+        if full or root_mtime != self.root_mtime:
+            try:
+                names = {
+                    e.name for e in os.scandir(self.root)
+                    if e.is_dir() and not e.name.startswith('.')
+                }
+            except OSError:
+                return
+            self.root_mtime = root_mtime
         
-        output_queue.put(f"Installing {len(selected_models)} models...")
+        artists = {}
+        for name in names:
+            artist = self.artists.get(name) or {'name': name, 'dirs': {}}
+            if self._refresh_artist(artist, full) or 'outputs' not in artist:
+                summary = self._summarize(artist)
+                with self.lock:
+                    artist.update(summary)
+            artists[name] = artist
         
-        # Download each model
-        for model in selected_models:
+        with self.lock:
+            self.artists = artists
+            self.scanned_at = time.time()
+        if full:
+            self.full_scan_at = time.time()
+
+    def run(self):
+        while True:
             try:
-                output_queue.put(f"Downloading {model['name']} ({model['size']})...")
-                
-                # Determine the correct directory path from filename
-                file_path = f"/workspace/ComfyUI/{model['filename']}"
-                
-                # Create directory if it doesn't exist
-                model_dir = os.path.dirname(file_path)
-                if model_dir:
-                    os.makedirs(model_dir, exist_ok=True)
-                
-                # Download the model using wget
-                cmd = f'cd /workspace/ComfyUI && wget -O "{model["filename"]}" "{model["url"]}"'
-                process = subprocess.run(
-                    cmd,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=1800  # 30 minutes for large models
-                )
-                
-                if process.returncode == 0:
-                    output_queue.put(f"✓ {model['name']} downloaded successfully")
-                else:
-                    output_queue.put(f"✗ Failed to download {model['name']}: {process.stderr}")
-                    logging.error(f"Model download failed: {process.stderr}")
-                    
-            except subprocess.TimeoutExpired:
-                output_queue.put(f"✗ Download of {model['name']} timed out")
-                return False
+                self.refresh()
             except Exception as e:
-                output_queue.put(f"✗ Error downloading {model['name']}: {str(e)}")
-                logging.error(f"Model download error: {e}")
+                logging.exception("Output catalog rescan failed: %s", e)
+            time.sleep(OUTPUT_SCAN_INTERVAL)
+
+    def names(self):
+        with self.lock:
+            return sorted(self.artists)
+
+    def summary(self, name):
+        with self.lock:
+            artist = self.artists.get(name)
+            if artist is None or 'outputs' not in artist:
+                return None
+            return {
+                'name': name,
+                'files': artist['files'],
+                'bytes': artist['bytes'],
+                'latest': datetime.fromtimestamp(artist['latest']).isoformat() if artist['latest'] else None
+            }
+
+    def files(self, name):
+        """Every output of an artist as (relpath, size, mtime), or None if the artist is unknown"""
+        with self.lock:
+            artist = self.artists.get(name)
+            return list(artist['outputs']) if artist and 'outputs' in artist else None
+
+    def outputs(self, name, offset=0, limit=100):
+        """One page of an artist's outputs, newest first. None if the artist is unknown"""
+        with self.lock:
+            artist = self.artists.get(name)
+            if artist is None or 'outputs' not in artist:
+                return None
+            page = artist['outputs'][offset:offset + limit]
+            total = artist['files']
+        return {
+            'total': total,
+            'outputs': [
+                {'path': path, 'size': size, 'mtime': datetime.fromtimestamp(mtime).isoformat()}
+                for path, size, mtime in page
+            ]
+        }
+
+output_catalog = OutputCatalog()
+
+class ThumbnailCache:
+    """Downscaled previews of artist outputs in a size-bounded on-disk LRU.
+
+    Entries are keyed by the source's path, mtime and size plus the requested
+    size and format, so an overwritten output never serves a stale preview and
+    the key doubles as a strong ETag. Hits bump the entry's mtime; once the
+    cache passes THUMB_CACHE_BYTES the least recently used entries are removed.
+    Generation runs in the request, bounded to THUMB_WORKERS at a time.
+    """
+
+    def __init__(self, cache_dir=THUMB_CACHE_DIR, max_bytes=THUMB_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = None  # OrderedDict of cache path -> bytes, oldest first
+        self.total = 0
+        self.workers = threading.BoundedSemaphore(THUMB_WORKERS)
+
+    def _load(self):
+        """Index the cache directory once, oldest entries first. Caller holds the lock"""
+        if self.entries is not None:
+            return
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith('.tmp'):
+                    os.remove(path)
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        found.sort()
+        self.entries = OrderedDict((path, size) for _, path, size in found)
+        self.total = sum(self.entries.values())
+
+    @staticmethod
+    def key(source, st, size, fmt):
+        return hashlib.sha256(f"{source}\0{st.st_mtime_ns}\0{st.st_size}\0{size}\0{fmt}".encode()).hexdigest()
+
+    def path_for(self, key, fmt):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{THUMB_EXTENSIONS[fmt]}")
+
+    def get(self, source, st, size, fmt):
+        """Return (key, cache path) for a thumbnail of source, generating it on a miss"""
+        key = self.key(source, st, size, fmt)
+        path = self.path_for(key, fmt)
+        with self.lock:
+            self._load()
+            if path in self.entries and os.path.exists(path):
+                self.entries.move_to_end(path)
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return key, path
         
-        output_queue.put("Individual model installation completed")
-        return True
+        with self.workers:
+            written = self._render(source, path, size, fmt)
+        with self.lock:
+            self.total += written - self.entries.pop(path, 0)
+            self.entries[path] = written
+            self._evict()
+        return key, path
+
+    def _render(self, source, path, size, fmt):
+        from PIL import Image
         
-    except Exception as e:
-        output_queue.put(f"Model installation failed: {str(e)}")
-        logging.error(f"Individual models installation error: {e}")
-        return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with Image.open(source) as img:
+                # Pillow only warns between one and two times MAX_IMAGE_PIXELS; refuse those before decoding
+                if Image.MAX_IMAGE_PIXELS and img.width * img.height > Image.MAX_IMAGE_PIXELS:
+                    raise ValueError(f"image is too large to preview: {img.width}x{img.height} pixels")
+                img.draft('RGB', (size, size))  # JPEG sources decode at reduced scale
+                img.thumbnail((size, size))
+                if fmt == 'jpeg' and img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                img.save(tmp_path, format=fmt.upper(), quality=THUMB_QUALITY)
+            os.replace(tmp_path, path)
+        except Image.DecompressionBombError as e:
+            raise ValueError(f"image is too large to preview: {e}") from e
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return os.path.getsize(path)
 
-def get_runpod_id():
-    """Get RunPod instance ID from environment"""
-    return os.environ.get('RUNPOD_POD_ID', 'localhost')
+    def _evict(self):
+        """Drop least recently used entries until the cache fits. Caller holds the lock"""
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            path, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
-def check_component_status(component):
-    status_file = f"{STATUS_DIR}/{component}_status.json"
-    if os.path.exists(status_file):
-        try:
-            with open(status_file, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {"installed": False, "installing": False, "timestamp": None}
+    def stats(self):
+        with self.lock:
+            self._load()
+            return {'entries': len(self.entries), 'bytes': self.total, 'max_bytes': self.max_bytes}
 
-def update_component_status(component, installed=False, installing=False):
-    status_file = f"{STATUS_DIR}/{component}_status.json"
-    status = {
-        "installed": installed,
-        "installing": installing,
-        "timestamp": datetime.now().isoformat()
-    }
-    with open(status_file, 'w') as f:
-        json.dump(status, f)
-    return status
+thumbnail_cache = ThumbnailCache()
 
-def check_comfyui_ready():
-    """Check if ComfyUI is responding"""
-    global comfyui_ready
-    try:
-        response = requests.get('http://localhost:8188/api/prompt', timeout=2)
-        comfyui_ready = response.status_code == 200
-    except:
-        comfyui_ready = False
-    return comfyui_ready
+def thumbnail_format(requested):
+    """The thumbnail format to use: ?format= if valid, else WebP when Pillow can write it"""
+    if requested in THUMB_EXTENSIONS:
+        return requested
+    from PIL import features
+    return 'webp' if features.check('webp') else 'jpeg'
 
-def stream_output(process):
-    """Stream process output to queue"""
-    global output_queue
-    for line in iter(process.stdout.readline, ''):
-        if line:
-            output_queue.put(line.strip())
-    for line in iter(process.stderr.readline, ''):
-        if line:
-            output_queue.put(f"ERROR: {line.strip()}")
+def artist_output_path(name, relpath):
+    """Resolve an output path inside an artist's folder, or None if it escapes it"""
+    artist_dir = os.path.realpath(os.path.join(OUTPUT_DIR, name))
+    path = os.path.realpath(os.path.join(artist_dir, relpath))
+    if name.startswith('.') or os.path.commonpath([artist_dir, path]) != artist_dir:
+        return None
+    return path
 
-def run_installation_script(component):
-    """Run installation script for component"""
-    global current_process, installation_in_progress
-    
+# Output export. The tar layout is a pure function of the planned (path, size, mtime)
+# list, so its length and every member's offset are known before a byte is read;
+# that is what lets a Range request resume mid-archive. Zip members need CRCs
+# computed from the data, so zip exports stream in one go without Range support.
+
+def plan_export(name, since=None, until=None, patterns=None):
+    """The files an export will contain, sorted by path: [(relpath, size, mtime)]"""
+    plan = []
+    for relpath, size, mtime in output_catalog.files(name) or []:
+        if since and mtime < since:
+            continue
+        if until and mtime >= until:
+            continue
+        if patterns and not any(fnmatch.fnmatch(relpath, p) for p in patterns):
+            continue
+        plan.append((relpath, size, mtime))
+    plan.sort()
+    return plan
+
+def export_etag(name, plan):
+    digest = hashlib.sha256(name.encode())
+    for relpath, size, mtime in plan:
+        digest.update(f"\0{relpath}\0{size}\0{int(mtime)}".encode())
+    return digest.hexdigest()
+
+def _tar_header(name, relpath, size, mtime):
+    info = tarfile.TarInfo(f"{name}/{relpath}")
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+def tar_segments(name, plan):
+    """The archive as (length, header bytes or None, file path, file size) segments"""
+    for relpath, size, mtime in plan:
+        header = _tar_header(name, relpath, size, mtime)
+        yield len(header), header, None, 0
+        yield size, None, os.path.join(OUTPUT_DIR, name, relpath), size
+        if size % tarfile.BLOCKSIZE:
+            yield tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE, None, None, 0
+    yield 2 * tarfile.BLOCKSIZE, None, None, 0  # end-of-archive marker
+
+def tar_length(name, plan):
+    return sum(length for length, *_ in tar_segments(name, plan))
+
+def stream_tar(name, plan, start=0, stop=None):
+    """Yield bytes [start, stop) of the tar archive of plan.
+
+    A file that shrank since it was planned is padded with zeros and one that
+    grew is cut at its planned size, so the layout never shifts under a resume.
+    """
+    offset = 0
+    for length, header, path, size in tar_segments(name, plan):
+        begin, end = max(start - offset, 0), length if stop is None else min(stop - offset, length)
+        offset += length
+        if begin >= end:
+            if stop is not None and offset >= stop:
+                return
+            continue
+        if header is not None:
+            yield header[begin:end]
+        elif path is None:
+            yield bytes(end - begin)
+        else:
+            yield from _read_span(path, begin, end)
+
+def _read_span(path, begin, end):
+    remaining = end - begin
     try:
-        installation_in_progress = True
-        update_component_status(component, installing=True)
-        
-        output_queue.put(f"Starting {component} installation...")
-        output_queue.put(f"Pulling installation scripts from GitHub...")
-        
-        temp_dir = f"/tmp/comfyui-install-{int(time.time())}"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Clone repository
-        clone_cmd = f"git clone {GITHUB_REPO} {temp_dir}"
-        process = subprocess.Popen(
-            clone_cmd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        stdout, stderr = process.communicate()
-        if process.returncode != 0:
-            raise Exception(f"Failed to clone repository: {stderr}")
-        
-        script_map = {
-            'comfyui': 'installer/install_comfyui.sh',
-            'models': 'installer/install_models.sh',
-            'nodes': 'installer/install_nodes.sh'
-        }
-        
-        script_path = f"{temp_dir}/{script_map[component]}"
+        with open(path, 'rb') as f:
+            f.seek(begin)
+            while remaining:
+                chunk = f.read(min(EXPORT_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    except OSError as e:
+        output_log.put(f"⚠️ Export: cannot read {path}: {e}")
+    while remaining:
+        pad = min(EXPORT_CHUNK_SIZE, remaining)
+        remaining -= pad
+        yield bytes(pad)
+
+class _ChunkSink:
+    """A write-only file object that collects what zipfile writes so it can be yielded"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return b''.join(chunks)
+
+def stream_zip(name, plan):
+    """Yield an uncompressed zip of plan; outputs are already compressed images"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for relpath, size, mtime in plan:
+            info = zipfile.ZipInfo(f"{name}/{relpath}", date_time=time.localtime(max(mtime, 315532800))[:6])
+            info.file_size = size
+            with archive.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+                for chunk in _read_span(os.path.join(OUTPUT_DIR, name, relpath), 0, size):
+                    member.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+def get_existing_artists():
+    """Get list of existing artist folders from the output catalog"""
+    return output_catalog.names()
+
+# Installer script parsing. One pass over the script tokenizes each command line and
+# understands every download dialect used by the installers in this repo:
+#   git clone [flags] <repo> [folder]
+#   wget [flags] -O <file> <url>      /  wget <url> -O <file>
+#   curl [flags] -o <file> <url>      /  curl <url> -o <file>
+#   download_model <url> <dir> [sha256]
+# A comment line directly above an entry may carry its description, size and sha256.
+_TOKEN_RE = re.compile(r'"([^"]*)"|\'([^\']*)\'|(#.*)|(\S+)')
+_ASSIGN_RE = re.compile(r'^(?:export\s+|local\s+)?([A-Za-z_][A-Za-z0-9_]*)=("[^"]*"|\'[^\']*\'|\S*)\s*(?:#.*)?$')
+_VAR_RE = re.compile(r'\$\{?([A-Za-z_][A-Za-z0-9_]*)\}?')
+_SIZE_RE = re.compile(r'(\d+\.?\d*\s*[GMK]B)', re.IGNORECASE)
+_SHA256_RE = re.compile(r'\b([0-9a-fA-F]{64})\b')
+_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+MODEL_EXTENSIONS = ('.safetensors', '.ckpt', '.pt', '.pth', '.bin', '.gguf')
+
+_parse_cache = {}
+_PARSE_CACHE_ENTRIES = 8
+
+def _tokenize(line):
+    """Split a shell command line into words without quotes, plus any trailing comment"""
+    words = []
+    for quoted, single, comment, bare in _TOKEN_RE.findall(line):
+        if comment:
+            return words, comment[1:].strip()
+        words.append(quoted or single or bare)
+    return words, None
+
+def _size_to_bytes(size_info):
+    number, unit = size_info[:-2].strip(), size_info[-2].upper()
+    return int(float(number) * _SIZE_UNITS[unit])
+
+def _comment_metadata(comment):
+    meta = {'description': None, 'size': None, 'sha256': None}
+    if comment:
+        meta['description'] = comment
+        size_match = _SIZE_RE.search(comment)
+        if size_match:
+            meta['size'] = size_match.group(1)
+        sha_match = _SHA256_RE.search(comment)
+        if sha_match:
+            meta['sha256'] = sha_match.group(1).lower()
+    return meta
+
+def _option_value(words, flag):
+    """Value following `flag` in words, plus the words with both removed"""
+    if flag in words:
+        i = words.index(flag)
+        if i + 1 < len(words):
+            return words[i + 1], words[:i] + words[i + 2:]
+    return None, words
+
+def _model_entry(url, dest_dir, filename, meta, sha256=None):
+    if not url.startswith(('http://', 'https://')) or not filename.endswith(MODEL_EXTENSIONS):
+        return None
+    if dest_dir and not os.path.isabs(dest_dir):
+        dest_dir = os.path.join(COMFYUI_DIR, dest_dir)
+    display_name = filename.replace('_', ' ').replace('-', ' ').rsplit('.', 1)[0]
+    size_info = meta['size'] or "Unknown size"
+    return {
+        'id': filename.lower().replace(' ', '_').replace('-', '_').replace('.', '_'),
+        'name': display_name,
+        'filename': filename,
+        'url': url,
+        'dest_dir': dest_dir or COMFYUI_DIR,
+        'size': size_info,
+        'size_bytes': _size_to_bytes(size_info) if meta['size'] else None,
+        'sha256': sha256 or meta['sha256']
+    }
+
+def _node_entry(words, meta):
+    args = [w for w in words[2:] if not w.startswith('-')]
+    # flags that take a value (--depth 1, -b main) leave that value in args; the repo URL is the first URL
+    urls = [w for w in args if '://' in w or w.startswith('git@')]
+    if not urls or 'github.com' not in urls[0]:
+        return None
+    repo_url = urls[0]
+    rest = args[args.index(repo_url) + 1:]
+    folder_name = repo_url.rstrip('/').split('/')[-1]
+    if folder_name.endswith('.git'):
+        folder_name = folder_name[:-4]
+    if rest:
+        folder_name = rest[0]
+    return {
+        'id': folder_name.lower().replace('-', '_').replace(' ', '_'),
+        'name': meta['description'] or folder_name.replace('-', ' ').replace('_', ' ').title(),
+        'repo_url': repo_url,
+        'folder_name': folder_name
+    }
+
+def _parse_installer_script(script_content):
+    models, nodes = [], []
+    seen_models, seen_nodes = set(), set()
+    variables = {}
+    comment = None
+
+    def expand(word):
+        return _VAR_RE.sub(lambda m: variables.get(m.group(1), m.group(0)), word) if '$' in word else word
+
+    for raw_line in script_content.splitlines():
+        line = raw_line.strip()
+        if not line:
+            comment = None
+            continue
+        if line[0] == '#':
+            comment = None if line.startswith('#!') else line[1:].strip()
+            continue
+
+        assignment = _ASSIGN_RE.match(line)
+        if assignment:
+            variables[assignment.group(1)] = expand(assignment.group(2).strip('"\''))
+            comment = None
+            continue
+
+        words, trailing = _tokenize(line)
+        meta = _comment_metadata(trailing or comment)
+        comment = None
+        command = words[0] if words else ''
+        entry = None
+
+        if command == 'download_model' and len(words) >= 3:
+            url, dest_dir = expand(words[1]), expand(words[2])
+            sha256 = words[3].lower() if len(words) > 3 and _SHA256_RE.fullmatch(words[3]) else None
+            entry = _model_entry(url, dest_dir, url.split('?')[0].rsplit('/', 1)[-1], meta, sha256)
+        elif command in ('wget', 'curl'):
+            target, rest = _option_value(words[1:], '-O' if command == 'wget' else '-o')
+            urls = [expand(w) for w in rest if w.startswith(('http', '$'))]
+            if target and urls:
+                target = expand(target)
+                entry = _model_entry(urls[-1], os.path.dirname(target), os.path.basename(target), meta)
+        elif command == 'git' and len(words) > 2 and words[1] == 'clone':
+            node = _node_entry([expand(w) for w in words], meta)
+            if node and node['id'] not in seen_nodes:
+                seen_nodes.add(node['id'])
+                nodes.append(node)
+            continue
+
+        if entry and entry['id'] not in seen_models:
+            seen_models.add(entry['id'])
+            models.append(entry)
+
+    return {'models': models, 'nodes': nodes}
+
+def parse_installer_script(script_content):
+    """Parse an installer script into its model and custom node catalog.
+
+    Results are memoized by content hash, so repeated calls for an unchanged
+    manifest are a dictionary lookup.
+    """
+    key = hashlib.sha256(script_content.encode()).hexdigest()
+    catalog = _parse_cache.get(key)
+    if catalog is None:
+        catalog = _parse_installer_script(script_content)
+        if len(_parse_cache) >= _PARSE_CACHE_ENTRIES:
+            _parse_cache.pop(next(iter(_parse_cache)))
+        _parse_cache[key] = catalog
+    return catalog
+
+def parse_nodes_from_script(script_content):
+    """Parse install_nodes.sh script to extract available custom nodes"""
+    return parse_installer_script(script_content)['nodes']
+
+def parse_models_from_script(script_content):
+    """Parse install_models.sh script to extract available models"""
+    return parse_installer_script(script_content)['models']
+
+def model_path(model):
+    """Absolute path a catalog model downloads to"""
+    return os.path.join(model['dest_dir'], model['filename'])
+
+# Content-addressed model store. Every model file under models/ is a hardlink (or a
+# symlink when the store is on another filesystem) to a blob named by its sha256, so
+# the same weights downloaded into several folders occupy disk space only once.
+_blob_store_lock = threading.Lock()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def blob_path(sha256):
+    return os.path.join(BLOB_STORE_DIR, 'sha256', sha256[:2], sha256)
+
+def _link_to_blob(blob, path):
+    """Atomically replace path with a hardlink to blob, or a symlink across filesystems"""
+    tmp_path = f"{path}.link-{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.link(blob, tmp_path)
+    except OSError:
+        os.symlink(blob, tmp_path)
+    os.replace(tmp_path, path)
+
+def link_model_from_store(sha256, path):
+    """Materialize path from an existing blob. Returns False if the store lacks it"""
+    blob = blob_path(sha256)
+    with _blob_store_lock:
+        if not os.path.exists(blob):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _link_to_blob(blob, path)
+    return True
+
+def store_model_file(path, sha256=None):
+    """Move a model file into the blob store and link it back into place.
+
+    If an identical blob already exists the file is replaced by a link to it and
+    its bytes are freed. Returns the file's sha256.
+    """
+    if os.path.islink(path):
+        return os.path.basename(os.path.realpath(path))
+    sha256 = sha256 or file_sha256(path)
+    blob = blob_path(sha256)
+    with _blob_store_lock:
+        if os.path.exists(blob):
+            if os.stat(blob).st_ino != os.stat(path).st_ino:
+                _link_to_blob(blob, path)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                os.link(path, blob)
+            except OSError:
+                # store lives on another filesystem: move the bytes there and symlink back
+                shutil.copy2(path, blob + '.tmp')
+                os.replace(blob + '.tmp', blob)
+                _link_to_blob(blob, path)
+            os.chmod(blob, 0o444)
+    return sha256
+
+def _iter_model_files(root=None):
+    for dirpath, dirnames, filenames in os.walk(root or MODELS_DIR):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for filename in filenames:
+            if filename.endswith(MODEL_EXTENSIONS):
+                yield os.path.join(dirpath, filename)
+
+def _iter_blobs():
+    root = os.path.join(BLOB_STORE_DIR, 'sha256')
+    if not os.path.isdir(root):
+        return
+    for prefix in os.listdir(root):
+        for name in os.listdir(os.path.join(root, prefix)):
+            if not name.endswith('.tmp'):
+                yield os.path.join(root, prefix, name)
+
+def dedupe_model_files(root=None):
+    """Move every model file under root into the store. Returns the number of files processed"""
+    count = 0
+    for path in _iter_model_files(root):
+        if os.path.islink(path) or os.path.getsize(path) < BLOB_STORE_MIN_SIZE:
+            continue
+        try:
+            store_model_file(path)
+            count += 1
+        except OSError as e:
+            logging.error(f"Could not store {path}: {e}")
+    return count
+
+def model_store_stats(root=None):
+    """Bytes referenced from models/, bytes actually stored, and unreferenced blobs"""
+    blobs = {}
+    for blob in _iter_blobs():
+        st = os.stat(blob)
+        blobs[st.st_ino] = {'path': blob, 'size': st.st_size}
+
+    referenced, logical_bytes, deduped_bytes = set(), 0, 0
+    for path in _iter_model_files(root):
+        sha256 = model_tier.tiered_sha256(path)  # a tiered model's volume copy is its blob
+        try:
+            st = os.stat(blob_path(sha256) if sha256 else path)  # follows symlinks into the store
+        except OSError:
+            continue
+        logical_bytes += st.st_size
+        if st.st_ino in blobs:
+            deduped_bytes += st.st_size
+            referenced.add(st.st_ino)
+
+    stored_bytes = sum(blobs[ino]['size'] for ino in referenced)
+    unreferenced = [blob for ino, blob in blobs.items() if ino not in referenced]
+    return {
+        'logical_bytes': logical_bytes,
+        'stored_bytes': stored_bytes,
+        'bytes_saved': deduped_bytes - stored_bytes,
+        'blobs': len(blobs),
+        'unreferenced_blobs': unreferenced
+    }
+
+def gc_model_store(root=None):
+    """Delete blobs no model file links to. Returns (blobs removed, bytes freed)"""
+    with _blob_store_lock:
+        unreferenced = model_store_stats(root)['unreferenced_blobs']
+        for blob in unreferenced:
+            os.remove(blob['path'])
+    return len(unreferenced), sum(blob['size'] for blob in unreferenced)
+
+_http_local = threading.local()
+
+def get_http_session():
+    """Return a keep-alive requests session owned by the calling thread"""
+    http = getattr(_http_local, 'session', None)
+    if http is None:
+        http = requests.Session()
+        _http_local.session = http
+    return http
+
+class DownloadError(Exception):
+    pass
+
+class IntegrityError(DownloadError):
+    """The downloaded bytes are complete but wrong: bad hash or a broken safetensors file"""
+
+class DownloadHasher:
+    """sha256 of a download, computed in file order while the bytes arrive.
+
+    Streamed downloads feed each block as it is written. Ranged downloads finish
+    chunks out of order, so whenever the contiguous prefix grows the new part is
+    read back from the .part file while it is still in the page cache.
+    """
+
+    def __init__(self, part_path):
+        self.part_path = part_path
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.digest = hashlib.sha256()
+        self.offset = 0
+
+    def update(self, block):
+        self.digest.update(block)
+        self.offset += len(block)
+
+    def catch_up(self, upto, blocking=True):
+        """Hash the .part file up to byte `upto`; without blocking, leave it to a thread already at it"""
+        if not self.lock.acquire(blocking=blocking):
+            return
+        try:
+            if upto < self.offset:
+                self.reset()
+            if upto == self.offset:
+                return
+            with open(self.part_path, 'rb') as f:
+                f.seek(self.offset)
+                while self.offset < upto:
+                    block = f.read(min(8 * 1024 * 1024, upto - self.offset))
+                    if not block:
+                        break
+                    self.update(block)
+        finally:
+            self.lock.release()
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+_SAFETENSORS_DTYPE_SIZES = {
+    'BOOL': 1, 'U8': 1, 'I8': 1, 'F8_E4M3': 1, 'F8_E5M2': 1,
+    'I16': 2, 'U16': 2, 'F16': 2, 'BF16': 2,
+    'I32': 4, 'U32': 4, 'F32': 4,
+    'I64': 8, 'U64': 8, 'F64': 8
+}
+
+def inspect_safetensors(path):
+    """Describe a .safetensors file from its JSON header, read through mmap.
+
+    Only the header pages are touched. The declared tensor byte ranges must fit
+    their dtype and shape and end exactly where the file does, which catches
+    truncated and padded downloads. 'problem' is None for a sound file.
+    """
+    info = {'format': 'safetensors', 'size': os.path.getsize(path), 'tensors': 0, 'parameters': 0, 'dtypes': {}, 'problem': None}
+    if info['size'] < 8:
+        info['problem'] = f"only {info['size']} bytes long"
+        return info
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_len = struct.unpack_from('<Q', mm, 0)[0]
+        if 8 + header_len > len(mm) or header_len > SAFETENSORS_MAX_HEADER:
+            info['problem'] = f"header of {header_len} bytes runs past the end of the file"
+            return info
+        try:
+            header = json.loads(mm[8:8 + header_len])
+        except ValueError:
+            header = None
+    if not isinstance(header, dict):
+        info['problem'] = "header is not a JSON object"
+        return info
+
+    data_end = 0
+    for name, tensor in header.items():
+        if name == '__metadata__':
+            continue
+        try:
+            begin, end = tensor['data_offsets']
+            count = 1
+            for dim in tensor['shape']:
+                count *= dim
+        except (TypeError, KeyError, ValueError):
+            info['problem'] = f"tensor {name} has no valid data_offsets and shape"
+            return info
+        if not 0 <= begin <= end:
+            info['problem'] = f"tensor {name} has an invalid byte range"
+            return info
+        item_size = _SAFETENSORS_DTYPE_SIZES.get(tensor.get('dtype'))
+        if item_size and end - begin != count * item_size:
+            info['problem'] = f"tensor {name} spans {end - begin} bytes but its shape needs {count * item_size}"
+            return info
+        data_end = max(data_end, end)
+        info['tensors'] += 1
+        info['parameters'] += count
+        info['dtypes'][tensor.get('dtype')] = info['dtypes'].get(tensor.get('dtype'), 0) + count
+    if 8 + header_len + data_end != info['size']:
+        info['problem'] = f"tensors end at byte {8 + header_len + data_end} but the file is {info['size']} bytes"
+    return info
+
+def inspect_checkpoint(path):
+    """Describe a PyTorch .ckpt/.pt/.pth/.bin file without unpickling it.
+
+    Current checkpoints are zip archives whose central directory sits at the end
+    of the file, so opening it through mmap proves the file is complete. Legacy
+    pickle checkpoints and GGUF files are only recognized by their magic bytes.
+    """
+    info = {'format': 'unknown', 'size': os.path.getsize(path), 'tensors': None, 'parameters': None, 'dtypes': {}, 'problem': None}
+    if info['size'] == 0:
+        info['problem'] = "file is empty"
+        return info
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:4] == b'GGUF':
+            info['format'] = 'gguf'
+            if len(mm) >= 24:
+                info['tensors'] = struct.unpack_from('<Q', mm, 8)[0]
+            else:
+                info['problem'] = "header is truncated"
+        elif mm[:4] == b'PK\x03\x04':
+            info['format'] = 'torch-zip'
+            try:
+                with zipfile.ZipFile(mm) as archive:
+                    info['tensors'] = sum(1 for n in archive.namelist() if '/data/' in n)
+            except zipfile.BadZipFile as e:
+                info['problem'] = f"zip archive is incomplete ({e})"
+        elif mm[:1] == b'\x80':
+            info['format'] = 'torch-pickle'
+    return info
+
+def inspect_model_file(path):
+    """Structural description of a model file; 'problem' is None if it looks sound"""
+    try:
+        if path.endswith('.safetensors'):
+            return inspect_safetensors(path)
+        return inspect_checkpoint(path)
+    except (OSError, ValueError) as e:
+        return {'format': 'unknown', 'size': None, 'tensors': None, 'parameters': None, 'dtypes': {}, 'problem': str(e)}
+
+def check_safetensors(path):
+    """Structural check of a .safetensors file. Returns None if sound, otherwise the problem"""
+    return inspect_safetensors(path)['problem']
+
+def check_model_file(path):
+    """Cheap structural check for a model file. Returns None if it looks sound"""
+    return inspect_model_file(path)['problem']
+
+def quarantine_model_file(path, reason):
+    """Move a bad model file aside so it is re-fetched, keeping the newest few for inspection"""
+    os.makedirs(QUARANTINE_DIR, exist_ok=True)
+    target = os.path.join(QUARANTINE_DIR, f"{int(time.time())}-{os.path.basename(path)}")
+    os.replace(path, target)
+    # os.replace keeps the download's mtime; prune by when it was quarantined
+    os.utime(target)
+    output_log.put(f"⚠️ Quarantined {os.path.basename(path)}: {reason}")
+    
+    entries = [e for e in os.scandir(QUARANTINE_DIR) if e.is_file(follow_symlinks=False)]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[QUARANTINE_KEEP:]:
+        os.remove(entry.path)
+    return target
+
+class ModelInventory:
+    """What is actually under models/, described from each file's header.
+
+    Entries are cached by (device, inode, size, mtime) on disk, so a rescan stats
+    every file but only opens the ones that are new or changed.
+    """
+
+    def __init__(self, root=MODELS_DIR, cache_path=MODEL_INVENTORY_CACHE):
+        self.root = root
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.entries = None  # relative path -> {'key': [...], 'info': {...}}
+        self.scanned_at = None
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.cache_path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def scan(self):
+        """Rescan the models tree. Returns {relative path: info}"""
+        with self.lock:
+            self._load()
+            entries, inspected = {}, 0
+            for root, dirs, files in os.walk(self.root, followlinks=True):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for name in files:
+                    if not name.endswith(MODEL_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    rel = os.path.relpath(path, self.root)
+                    key = [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+                    cached = self.entries.get(rel)
+                    if cached and cached['key'] == key:
+                        entries[rel] = cached
+                        continue
+                    info = inspect_model_file(path)
+                    info['dtype'] = max(info['dtypes'], key=info['dtypes'].get) if info['dtypes'] else None
+                    info['truncated'] = info['problem'] is not None
+                    info['mtime'] = datetime.fromtimestamp(st.st_mtime).isoformat()
+                    entries[rel] = {'key': key, 'info': info}
+                    inspected += 1
+            changed = inspected or entries.keys() != self.entries.keys()
+            self.entries = entries
+            self.scanned_at = time.time()
+            if changed:
+                self._save()
+            return {rel: entry['info'] for rel, entry in entries.items()}
+
+model_inventory = ModelInventory()
+
+def model_names_in(value):
+    """Model file names referenced anywhere in a prompt or workflow JSON value"""
+    if isinstance(value, str):
+        return {value.replace('\\', '/')} if value.endswith(MODEL_EXTENSIONS) else set()
+    items = value.values() if isinstance(value, dict) else value if isinstance(value, list) else ()
+    names = set()
+    for item in items:
+        names |= model_names_in(item)
+    return names
+
+def model_paths_by_name():
+    """Map names as ComfyUI's loaders see them ('sub/x.safetensors', relative to the model type folder) to paths"""
+    by_name = {}
+    for rel in model_inventory.scan():
+        parts = rel.split(os.sep, 1)
+        if len(parts) == 2:
+            by_name.setdefault(parts[1].replace(os.sep, '/'), []).append(os.path.join(MODELS_DIR, rel))
+    return by_name
+
+class ModelTier:
+    """Keeps the most used models on the container's local disk.
+
+    ComfyUI's prompt history shows which model files each session loads. Files
+    used at least TIER_MIN_USES times are copied to MODEL_TIER_DIR, named by
+    their sha256, and models/<type>/<file> is atomically swapped for a symlink
+    to the local copy. The volume copy stays in the blob store, so eviction (least
+    recently used first, to stay within MODEL_TIER_BYTES) swaps the path back
+    to the blob. Local disk does not survive a pod restart, so reconcile() at
+    startup points any link whose local copy is gone back at the blob store.
+    """
+
+    def __init__(self, tier_dir=MODEL_TIER_DIR, budget=MODEL_TIER_BYTES):
+        self.tier_dir = os.path.realpath(tier_dir)
+        self.budget = budget
+        self.lock = threading.RLock()
+        self.entries = {}  # model path -> {'sha256', 'size', 'tiered_at'}
+        self.copying = {}  # model path -> size, reserved while its copy is written
+        self.evicting = {}  # model path -> entry, still counted until its local copy is gone
+        self.usage = {}  # model path -> {'uses', 'last_used'}
+        self.seen_prompts = deque(maxlen=1000)
+        self.http = requests.Session()
+        self.disabled_reason = None if budget > 0 else 'MODEL_TIER_BYTES is 0'
+
+    def tiered_sha256(self, path):
+        """sha256 of the tiered copy a model path links to, or None if it is not tiered"""
+        if os.path.islink(path):
+            target = os.path.realpath(path)
+            if os.path.dirname(target) == self.tier_dir:
+                return os.path.basename(target)
+        return None
+
+    def used_bytes(self):
+        """Bytes of local copies, including those still being written or evicted"""
+        with self.lock:
+            return (
+                sum(entry['size'] for entry in self.entries.values())
+                + sum(entry['size'] for entry in self.evicting.values())
+                + sum(self.copying.values())
+            )
+
+    def reconcile(self):
+        """Adopt tiered links whose local copy survived and restore the rest to the blob store.
+
+        Runs even with tiering disabled, so links left by an earlier configuration
+        never dangle.
+        """
+        if not self.disabled_reason:
+            try:
+                os.makedirs(self.tier_dir, exist_ok=True)
+                if os.stat(self.tier_dir).st_dev == os.stat(MODELS_DIR).st_dev:
+                    self.disabled_reason = f"{self.tier_dir} is on the same disk as {MODELS_DIR}"
+            except OSError as e:
+                self.disabled_reason = str(e)
+        
+        for path in _iter_model_files():
+            sha256 = self.tiered_sha256(path)
+            if not sha256:
+                continue
+            local = os.path.join(self.tier_dir, sha256)
+            if os.path.exists(local) and not self.disabled_reason:
+                with self.lock:
+                    self.entries[path] = {'sha256': sha256, 'size': os.path.getsize(local), 'tiered_at': os.path.getmtime(local)}
+                continue
+            with _blob_store_lock:
+                _link_to_blob(blob_path(sha256), path)
+            if os.path.exists(local):
+                os.remove(local)
+            output_log.put(f"Model tier: {os.path.basename(path)} points at the volume again")
+        
+        # copies no link points at, e.g. left by an interrupted promotion
+        if not self.disabled_reason:
+            live = {entry['sha256'] for entry in self.entries.values()}
+            for name in os.listdir(self.tier_dir):
+                if name not in live:
+                    os.remove(os.path.join(self.tier_dir, name))
+
+    def record_use(self, paths):
+        now = time.time()
+        with self.lock:
+            for path in paths:
+                usage = self.usage.setdefault(path, {'uses': 0, 'last_used': now})
+                usage['uses'] += 1
+                usage['last_used'] = now
+
+    def sample_history(self):
+        """Count the model files used by prompts that ran since the last sample"""
+        by_name = model_paths_by_name()
+        for artist_session in session_manager.list():
+            if not artist_session.running():
+                continue
+            try:
+                response = self.http.get(f'http://localhost:{artist_session.port}/history', params={'max_items': 50}, timeout=5)
+                history = response.json() if response.status_code == 200 else {}
+            except (requests.RequestException, ValueError):
+                continue
+            for prompt_id, item in history.items():
+                if prompt_id in self.seen_prompts:
+                    continue
+                self.seen_prompts.append(prompt_id)
+                try:
+                    names = model_names_in(item['prompt'][2])
+                except (KeyError, IndexError, TypeError):
+                    continue
+                self.record_use(path for name in names for path in by_name.get(name, []))
+
+    def promote(self, path, evict=True):
+        """Copy a model to local disk and swap its path to the copy. Returns False if it does not fit.
+
+        The space is reserved under the lock before copying, so concurrent
+        promotions never overshoot the budget. With evict=False only free
+        budget is used and no other copy is evicted to make room. Victims are
+        only picked under the lock; their multi-GB copies back to the volume
+        run outside it, so status and other promotions are never held up.
+        """
+        with self.lock:
+            if self.disabled_reason or path in self.entries or path in self.copying or path in self.evicting:
+                return path in self.entries
+            size = os.path.getsize(path)
+            if size > self.budget:
+                return False
+            victims = self._pick_victims(size, keep=path) if evict else []
+            # the victims' bytes are on their way out, so they already count as room
+            if self.used_bytes() - sum(entry['size'] for _, entry in victims) + size > self.budget:
+                return False
+            self.copying[path] = size
+        
+        try:
+            for victim, entry in victims:
+                self._evict_entry(victim, entry)
+            with self.lock:
+                if shutil.disk_usage(self.tier_dir).free - sum(self.copying.values()) < TIER_MIN_FREE:
+                    return False
+            
+            # copy and hash in one pass; the copy only appears under its final name once complete
+            started = time.time()
+            tmp_path = os.path.join(self.tier_dir, f".{os.path.basename(path)}.{threading.get_ident()}.tmp")
+            digest = hashlib.sha256()
+            try:
+                with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                    for block in iter(lambda: src.read(TIER_COPY_CHUNK), b''):
+                        digest.update(block)
+                        dst.write(block)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                if os.path.getsize(tmp_path) != size:
+                    raise OSError(f"{path} changed while it was being copied")
+                sha256 = digest.hexdigest()
+                local = os.path.join(self.tier_dir, sha256)
+                os.replace(tmp_path, local)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            
+            # keep the volume copy in the blob store, then point the model path at the local copy
+            store_model_file(path, sha256)
+            link = f"{path}.tier-{threading.get_ident()}"
+            os.symlink(local, link)
+            os.replace(link, path)
+            with self.lock:
+                self.entries[path] = {'sha256': sha256, 'size': size, 'tiered_at': time.time()}
+        finally:
+            with self.lock:
+                self.copying.pop(path, None)
+                # victims left unevicted by a failure stay tiered
+                for victim, entry in victims:
+                    if self.evicting.get(victim) is entry:
+                        self.entries[victim] = self.evicting.pop(victim)
+        output_log.put(f"Model tier: {os.path.basename(path)} copied to local disk ({size / 1e9:.1f} GB in {time.time() - started:.0f}s)")
+        return True
+
+    def evict(self, path):
+        """Point a model path back at the volume copy and delete the local one"""
+        with self.lock:
+            entry = self.entries.pop(path, None)
+            if entry is None:
+                return False
+            self.evicting[path] = entry
+        self._evict_entry(path, entry)
+        return True
+
+    def _evict_entry(self, path, entry):
+        """Copy a picked victim back to the volume, relink it and delete the local copy. Runs without the lock"""
+        try:
+            local = os.path.join(self.tier_dir, entry['sha256'])
+            blob = blob_path(entry['sha256'])
+            with _blob_store_lock:
+                if not os.path.exists(blob):
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    shutil.copyfile(local, blob + '.tmp')
+                    os.replace(blob + '.tmp', blob)
+                    os.chmod(blob, 0o444)
+                if self.tiered_sha256(path) == entry['sha256']:
+                    _link_to_blob(blob, path)
+            if os.path.exists(local):
+                os.remove(local)  # a ComfyUI that still has it open keeps reading until it closes it
+        finally:
+            with self.lock:
+                self.evicting.pop(path, None)
+        output_log.put(f"Model tier: evicted {os.path.basename(path)}")
+
+    def _last_used(self, path):
+        return self.usage.get(path, {}).get('last_used', 0)
+
+    def _pick_victims(self, size, keep=None):
+        """Mark least recently used copies as evicting until size more bytes would fit. Caller holds the lock
+
+        Picks nothing if evicting every other copy would still not make room.
+        Returns (path, entry) pairs for the caller to evict outside the lock.
+        """
+        victims = []
+        room = self.budget - self.used_bytes()
+        for path in sorted(self.entries, key=self._last_used):
+            if room >= size:
+                break
+            if path != keep:
+                victims.append((path, self.entries[path]))
+                room += self.entries[path]['size']
+        if room < size:
+            return []
+        for path, entry in victims:
+            self.evicting[path] = self.entries.pop(path)
+        return victims
+
+    def rebalance(self):
+        """Promote the most recently used hot models that are not local yet"""
+        with self.lock:
+            hot = sorted(
+                (path for path, usage in self.usage.items() if usage['uses'] >= TIER_MIN_USES and path not in self.entries),
+                key=self._last_used,
+                reverse=True
+            )
+        for path in hot:
+            with self.lock:
+                # never evict something used more recently than what would replace it
+                colder = sum(e['size'] for p, e in self.entries.items() if self._last_used(p) < self._last_used(path))
+            try:
+                if os.path.exists(path) and os.path.getsize(path) <= self.budget - self.used_bytes() + colder:
+                    self.promote(path)
+            except OSError as e:
+                output_log.put(f"Model tier: could not copy {os.path.basename(path)}: {e}")
+
+    def run(self):
+        """Sample usage and rebalance until the manager exits. Call reconcile() first"""
+        if self.disabled_reason:
+            logging.info(f"Model tier disabled: {self.disabled_reason}")
+            return
+        while True:
+            time.sleep(TIER_INTERVAL)
+            try:
+                self.sample_history()
+                self.rebalance()
+            except Exception as e:
+                logging.exception("Model tier update failed: %s", e)
+
+    def status(self):
+        with self.lock:
+            return {
+                'enabled': not self.disabled_reason,
+                'disabled_reason': self.disabled_reason,
+                'tier_dir': self.tier_dir,
+                'budget_bytes': self.budget,
+                'used_bytes': self.used_bytes(),
+                'models': [
+                    dict(entry, path=os.path.relpath(path, MODELS_DIR), **self.usage.get(path, {}))
+                    for path, entry in sorted(self.entries.items(), key=lambda e: -self._last_used(e[0]))
+                ],
+                'usage': {os.path.relpath(path, MODELS_DIR): usage for path, usage in self.usage.items()}
+            }
+
+model_tier = ModelTier()
+
+def png_text_chunks(path):
+    """The tEXt/iTXt chunks of a PNG, where ComfyUI embeds each output's prompt and workflow"""
+    texts = {}
+    with open(path, 'rb') as f:
+        if f.read(8) != b'\x89PNG\r\n\x1a\n':
+            return texts
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', head)
+            if chunk_type in (b'IDAT', b'IEND'):
+                break  # text chunks written by ComfyUI come before the image data
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)  # CRC
+            if chunk_type == b'tEXt':
+                key, _, value = data.partition(b'\0')
+                texts[key.decode('latin-1')] = value.decode('latin-1')
+            elif chunk_type == b'iTXt':
+                key, _, rest = data.partition(b'\0')
+                compressed, rest = rest[0], rest[2:]
+                value = rest.split(b'\0', 2)[-1]
+                texts[key.decode('latin-1')] = (zlib.decompress(value) if compressed else value).decode('utf-8', 'replace')
+    return texts
+
+def recent_workflow_models(artist, port=None):
+    """Model names in an artist's recent work, with how many workflows use each.
+
+    Reads the prompts ComfyUI embedded in the artist's newest PNG outputs, the
+    most recently saved workflows, and the session's history if it is up.
+    """
+    counts = {}
+
+    def count(value):
+        for name in model_names_in(value):
+            counts[name] = counts.get(name, 0) + 1
+
+    pngs = [relpath for relpath, _, _ in output_catalog.files(artist) or [] if relpath.endswith('.png')]
+    for relpath in pngs[:PREFETCH_RECENT_OUTPUTS]:
+        try:
+            texts = png_text_chunks(os.path.join(OUTPUT_DIR, artist, relpath))
+            count(json.loads(texts.get('prompt') or texts.get('workflow') or 'null'))
+        except (OSError, ValueError, IndexError, zlib.error):
+            continue
+
+    try:
+        saved = sorted(Path(WORKFLOWS_DIR).rglob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+    except OSError:
+        saved = []
+    for path in saved[:PREFETCH_RECENT_WORKFLOWS]:
+        try:
+            count(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+
+    if port:
+        try:
+            history = requests.get(f'http://localhost:{port}/history', params={'max_items': 50}, timeout=2).json()
+            for item in history.values():
+                count(item.get('prompt'))
+        except (requests.RequestException, ValueError, AttributeError):
+            pass
+    return counts
+
+def _warm_page_cache(path):
+    """Read a file once so its pages are cached. Returns the bytes read"""
+    warmed = 0
+    with open(path, 'rb', buffering=0) as f:
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except (AttributeError, OSError):
+            pass
+        buffer = bytearray(PREFETCH_CHUNK)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            warmed += n
+    return warmed
+
+def _memory_available():
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def prefetch_session_models(artist_session):
+    """Warm the models an artist's recent workflows use while their ComfyUI boots.
+
+    Models go to the local tier when it is enabled and has room, otherwise they
+    are read into the page cache. The page-cache budget is PREFETCH_MAX_BYTES,
+    capped at half the memory available so warming never evicts its own work.
+    Progress and the final report are kept in artist_session.prefetch.
+    """
+    started = time.time()
+    report = artist_session.prefetch = {'state': 'planning', 'models': [], 'bytes_warmed': 0, 'tiered': 0, 'seconds': None}
+    counts = recent_workflow_models(artist_session.artist, artist_session.port if artist_session.monitor.state == 'ready' else None)
+    by_name = model_paths_by_name()
+
+    budget = PREFETCH_MAX_BYTES
+    memory = _memory_available()
+    if memory:
+        budget = min(budget, memory // 2)
+    plan, planned = [], 0
+    for name in sorted(counts, key=lambda n: -counts[n]):
+        for path in by_name.get(name, []):
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if planned + size > budget:
+                continue
+            plan.append(path)
+            planned += size
+    report['models'] = [os.path.relpath(p, MODELS_DIR) for p in plan]
+    report['state'] = 'warming'
+
+    def warm(path):
+        """Returns (bytes warmed, whether the model went to the local tier)"""
+        size = os.path.getsize(path)
+        # only take free tier space; evicting another session's hot models would just move the cold start
+        if not model_tier.disabled_reason and model_tier.tiered_sha256(path) is None:
+            try:
+                if model_tier.promote(path, evict=False):
+                    return size, True  # just written, so already in the page cache
+            except OSError as e:
+                logging.warning(f"Could not tier {path}: {e}")
+        return _warm_page_cache(path), False
+
+    with ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY) as pool:
+        for path, future in [(p, pool.submit(warm, p)) for p in plan]:
+            try:
+                warmed, tiered = future.result()
+            except OSError as e:
+                logging.warning(f"Could not prefetch {path}: {e}")
+                continue
+            report['bytes_warmed'] += warmed
+            report['tiered'] += tiered
+
+    report['seconds'] = round(time.time() - started, 1)
+    report['state'] = 'done'
+    prefetch_bytes.inc(report['bytes_warmed'])
+    prefetch_duration.observe(report['seconds'])
+    if plan:
+        output_log.put(
+            f"Prefetched {len(plan)} models for {artist_session.artist}: "
+            f"{report['bytes_warmed'] / 1e9:.1f} GB warmed in {report['seconds']:.0f}s"
+        )
+    return report
+
+def probe_download(url):
+    """HEAD the URL to learn its size, range support and validator"""
+    info = {'size': None, 'ranges': False, 'validator': None}
+    try:
+        response = get_http_session().head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+    except requests.RequestException:
+        return info
+    if response.status_code >= 400:
+        return info
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit():
+        info['size'] = int(length)
+    info['ranges'] = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    info['validator'] = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    return info
+
+def _load_part_state(state_path, info, chunk_size):
+    """Chunks already written to the .part file by an earlier attempt"""
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if (state.get('size') == info['size'] and state.get('validator') == info['validator']
+                and state.get('chunk_size') == chunk_size):
+            return set(state.get('done', []))
+    except (OSError, ValueError):
+        pass
+    return set()
+
+def _save_part_state(state_path, info, chunk_size, done):
+    with open(state_path, 'w') as f:
+        json.dump({
+            'size': info['size'],
+            'validator': info['validator'],
+            'chunk_size': chunk_size,
+            'done': sorted(done)
+        }, f)
+
+def _download_ranged(url, part_path, info, chunk_size, chunk_workers, progress, hasher):
+    """Fetch the file as parallel HTTP Range chunks into a preallocated .part file"""
+    size = info['size']
+    state_path = part_path + '.json'
+    chunks = [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+    done = set()
+    if os.path.exists(part_path) and os.path.getsize(part_path) == size:
+        done = _load_part_state(state_path, info, chunk_size)
+    else:
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+    info['resumed'] = sum(chunks[i][1] - chunks[i][0] + 1 for i in done)
+    progress(info['resumed'])
+
+    lock = threading.Lock()
+
+    def fetch(index):
+        start, end = chunks[index]
+        for attempt in range(DOWNLOAD_RETRIES):
+            written = 0
+            try:
+                headers = {'Range': f'bytes={start}-{end}'}
+                with get_http_session().get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    if response.status_code >= 500:
+                        raise DownloadError(f"server error on bytes {start}-{end} (HTTP {response.status_code})")
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise DownloadError(f"server ignored range request (HTTP {response.status_code})")
+                    with open(part_path, 'r+b') as f:
+                        f.seek(start)
+                        for block in response.iter_content(1024 * 1024):
+                            f.write(block)
+                            written += len(block)
+                            progress(len(block))
+                if written != end - start + 1:
+                    raise DownloadError(f"short read on bytes {start}-{end}")
+                with lock:
+                    done.add(index)
+                    _save_part_state(state_path, info, chunk_size, done)
+                    contiguous = 0
+                    while contiguous in done:
+                        contiguous += 1
+                if contiguous:
+                    hasher.catch_up(chunks[contiguous - 1][1] + 1, blocking=False)
+                return
+            except (requests.RequestException, DownloadError):
+                progress(-written)
+                if attempt == DOWNLOAD_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+    pending = [i for i in range(len(chunks)) if i not in done]
+    with ThreadPoolExecutor(max_workers=chunk_workers) as pool:
+        for future in [pool.submit(fetch, i) for i in pending]:
+            future.result()
+
+    with open(part_path, 'r+b') as f:
+        os.fsync(f.fileno())
+    os.remove(state_path)
+    hasher.catch_up(size)
+
+def _download_stream(url, part_path, info, progress, hasher):
+    """Fetch the file as a single stream, appending to any existing .part file"""
+    reported = 0
+    for attempt in range(DOWNLOAD_RETRIES):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if info['size'] is not None and offset > info['size']:
+            # left by a different, larger file under the same URL; it cannot be resumed
+            os.remove(part_path)
+            offset = 0
+        if info['size'] is not None and offset == info['size']:
+            info.setdefault('resumed', offset)
+            hasher.catch_up(offset)
+            return
+        headers = {'Range': f'bytes={offset}-'} if offset and info['ranges'] else {}
+        try:
+            with get_http_session().get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 416:
+                    # the .part file does not fit the remote file any more; start over
+                    os.remove(part_path)
+                    continue
+                response.raise_for_status()
+                if response.status_code != 206:
+                    offset = 0
+                info.setdefault('resumed', offset)
+                progress(offset - reported)
+                reported = offset
+                hasher.catch_up(offset)
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for block in response.iter_content(1024 * 1024):
+                        f.write(block)
+                        hasher.update(block)
+                        reported += len(block)
+                        progress(len(block))
+                    f.flush()
+                    os.fsync(f.fileno())
+            return
+        except requests.RequestException:
+            if attempt == DOWNLOAD_RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+    raise DownloadError("server kept refusing the resume range")
+
+def download_file(url, dest_path, chunk_size=DOWNLOAD_CHUNK_SIZE, chunk_workers=DOWNLOAD_CHUNK_WORKERS,
+                  progress=None, info=None, sha256=None):
+    """Download url to dest_path through a resumable .part file, renamed into place once complete.
+
+    The sha256 is computed while downloading and stored in info['sha256'], and
+    the bytes picked up from an earlier partial download in info['resumed']. A
+    file that does not match the expected sha256, or a .safetensors file whose
+    header does not add up, is quarantined and IntegrityError is raised.
+
+    Returns 'exists' if dest_path is already present, otherwise 'downloaded'.
+    """
+    if os.path.exists(dest_path):
+        return 'exists'
+    os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+    progress = progress or (lambda n: None)
+    part_path = dest_path + '.part'
+
+    info = info or probe_download(url)
+    info.pop('resumed', None)
+    hasher = DownloadHasher(part_path)
+    if info['size'] and info['ranges'] and info['size'] > chunk_size and chunk_workers > 1:
+        _download_ranged(url, part_path, info, chunk_size, chunk_workers, progress, hasher)
+    else:
+        _download_stream(url, part_path, info, progress, hasher)
+
+    if info['size'] is not None and os.path.getsize(part_path) != info['size']:
+        raise DownloadError(f"expected {info['size']} bytes, got {os.path.getsize(part_path)}")
+    info['sha256'] = hasher.hexdigest()
+    problem = None
+    if sha256 and info['sha256'] != sha256.lower():
+        problem = f"sha256 {info['sha256'][:12]} does not match the expected {sha256[:12]}"
+    elif dest_path.endswith('.safetensors'):
+        problem = check_safetensors(part_path)
+    if problem:
+        quarantine_model_file(part_path, problem)
+        raise IntegrityError(f"{os.path.basename(dest_path)}: {problem}")
+    os.replace(part_path, dest_path)
+    return 'downloaded'
+
+def download_models(downloads, concurrency=DOWNLOAD_CONCURRENCY):
+    """Download several models at once, at most `concurrency` in flight.
+
+    Each entry needs 'name', 'url' and 'path'. Returns a list of the names that failed.
+    """
+    failed = []
+    job = job_scheduler.current_job()
+
+    def run(item):
+        check_job_cancelled(job)
+        state = {'bytes': 0, 'step': 0}
+        lock = threading.Lock()
+        if os.path.exists(item['path']):
+            problem = check_model_file(item['path'])
+            if not problem:
+                return 'exists', 0
+            quarantine_model_file(item['path'], problem)
+        if item.get('sha256') and link_model_from_store(item['sha256'], item['path']):
+            return 'linked', 0
+        info = probe_download(item['url'])
+        total = info['size']
+
+        def progress(n):
+            check_job_cancelled(job)
+            if not total:
+                return
+            with lock:
+                state['bytes'] += n
+                step = state['bytes'] * 10 // total
+                if step > state['step'] and step < 10:
+                    state['step'] = step
+                    output_log.put(f"  {item['name']}: {step * 10}%")
+
+        started = time.time()
+        for attempt in range(2):
+            result_info = dict(info)
+            try:
+                result = download_file(item['url'], item['path'], progress=progress, info=result_info, sha256=item.get('sha256'))
+                break
+            except IntegrityError as e:
+                # the bad bytes were quarantined, so the next attempt starts clean
+                if attempt:
+                    raise
+                output_log.put(f"↻ Re-fetching {item['name']}: {e}")
+                with lock:
+                    state['bytes'] = state['step'] = 0
+        elapsed = time.time() - started
+        size = os.path.getsize(item['path'])
+        # bytes resumed from an earlier run's .part file did not cross the network now
+        fetched = size - result_info.get('resumed', size)
+        download_bytes.inc(fetched, model=item['name'])
+        download_duration.observe(elapsed, model=item['name'])
+        download_throughput.set(fetched / max(elapsed, 0.001), model=item['name'])
+        store_model_file(item['path'], result_info.get('sha256'))
+        return result, elapsed
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(run, item): item for item in downloads}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result, elapsed = future.result()
+                if result == 'exists':
+                    output_log.put(f"✓ {item['name']} already exists, skipping")
+                elif result == 'linked':
+                    output_log.put(f"✓ {item['name']} linked from model store")
+                else:
+                    output_log.put(f"✓ {item['name']} downloaded successfully ({elapsed:.0f}s)")
+            except Exception as e:
+                failed.append(item['name'])
+                output_log.put(f"✗ Failed to download {item['name']}: {str(e)}")
+                logging.error(f"Model download failed: {e}")
+
+    return failed
+
+_manifest_cache = {}
+_manifest_lock = threading.Lock()
+_manifest_refreshing = set()
+
+def _manifest_cache_path(script):
+    return os.path.join(MANIFEST_CACHE_DIR, script.replace('/', '__'))
+
+def _load_cached_manifest(script):
+    """Memory copy of a manifest, falling back to the on-disk copy from a previous run"""
+    entry = _manifest_cache.get(script)
+    if entry is not None:
+        return entry
+    path = _manifest_cache_path(script)
+    try:
+        with open(path + '.json', 'r') as f:
+            entry = json.load(f)
+        with open(path, 'r') as f:
+            entry['text'] = f.read()
+    except:
+        return None
+    _manifest_cache[script] = entry
+    return entry
+
+def _store_cached_manifest(script, entry):
+    _manifest_cache[script] = entry
+    path = _manifest_cache_path(script)
+    try:
+        os.makedirs(MANIFEST_CACHE_DIR, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            f.write(entry['text'])
+        os.replace(path + '.tmp', path)
+        with open(path + '.json.tmp', 'w') as f:
+            json.dump({k: v for k, v in entry.items() if k != 'text'}, f)
+        os.replace(path + '.json.tmp', path + '.json')
+    except Exception as e:
+        logging.error(f"Could not persist manifest cache for {script}: {e}")
+
+def _refresh_manifest(script, entry):
+    """Conditionally re-fetch a manifest from GitHub. Returns the new cache entry"""
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    started = time.time()
+    try:
+        response = get_http_session().get(f"{GITHUB_RAW}/{script}", headers=headers, timeout=MANIFEST_TIMEOUT)
+    except requests.RequestException:
+        github_fetch_duration.observe(time.time() - started, script=script, status='error')
+        raise
+    github_fetch_duration.observe(time.time() - started, script=script, status=response.status_code)
+    if response.status_code == 304 and entry:
+        entry = dict(entry, fetched_at=time.time())
+    elif response.status_code == 200:
+        entry = {
+            'text': response.text,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+    else:
+        raise Exception(f"HTTP {response.status_code} fetching {script}")
+
+    with _manifest_lock:
+        _store_cached_manifest(script, entry)
+    return entry
+
+def _refresh_manifest_in_background(script, entry):
+    with _manifest_lock:
+        if script in _manifest_refreshing:
+            return
+        _manifest_refreshing.add(script)
+
+    def refresh():
+        try:
+            _refresh_manifest(script, entry)
+        except Exception as e:
+            logging.warning(f"Manifest revalidation failed for {script}, serving stale copy: {e}")
+        finally:
+            with _manifest_lock:
+                _manifest_refreshing.discard(script)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+def fetch_manifest(script, revalidate=False):
+    """Return the text of an installer script from the repo, or None if it can't be had.
+
+    Fresh copies (younger than MANIFEST_TTL) are served from memory. Stale copies are
+    served immediately while a conditional request revalidates them in the background;
+    only a cold cache waits on GitHub. With revalidate=True a stale copy is
+    revalidated before returning, falling back to it if GitHub is unreachable.
+    """
+    with _manifest_lock:
+        entry = _load_cached_manifest(script)
+
+    if entry is not None:
+        if time.time() - entry.get('fetched_at', 0) >= MANIFEST_TTL:
+            if not revalidate:
+                _refresh_manifest_in_background(script, entry)
+                return entry['text']
+            try:
+                entry = _refresh_manifest(script, entry)
+            except Exception as e:
+                logging.warning(f"Could not revalidate {script}, using cached copy: {e}")
+        return entry['text']
+
+    try:
+        return _refresh_manifest(script, None)['text']
+    except Exception as e:
+        logging.error(f"Error fetching {script}: {e}")
+        return None
+
+def warm_manifests():
+    """Prime the manifest cache so the admin panel opens without waiting on GitHub"""
+    for script in (NODES_SCRIPT, MODELS_SCRIPT):
+        fetch_manifest(script)
+
+_REQUIREMENT_NAME_RE = re.compile(r'^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(.*)$')
+
+def clone_node(node, job=None):
+    """Shallow-clone a custom node into custom_nodes. Returns 'exists' or 'cloned'.
+
+    git's output goes to the output log prefixed with the node name, and the
+    process is registered with `job` so cancelling the install kills it.
+    """
+    dest = os.path.join(CUSTOM_NODES_DIR, node['folder_name'])
+    if os.path.exists(dest):
+        return 'exists'
+    process = subprocess.Popen(
+        ['git', 'clone', '--depth', '1', '--single-branch', node['repo_url'], dest],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+        start_new_session=True
+    )
+    job_scheduler.track_process(process, job)
+    started = time.time()
+    timer = threading.Timer(NODE_CLONE_TIMEOUT, _terminate_process_group, (process,))
+    timer.start()
+    try:
+        stderr = stream_output(process, prefix=f"{node['name']}: ")
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+    if returncode != 0:
+        shutil.rmtree(dest, ignore_errors=True)
+        check_job_cancelled(job)
+        if time.time() - started >= NODE_CLONE_TIMEOUT:
+            raise subprocess.TimeoutExpired(process.args, NODE_CLONE_TIMEOUT)
+        errors = [line for line in stderr if line.startswith(('fatal:', 'error:'))]
+        raise Exception(errors[0] if errors else 'git clone failed')
+    return 'cloned'
+
+def specifiers_satisfiable(specifiers):
+    """Whether some version can satisfy all of the given specifier strings at once.
+
+    Tries the versions the specifiers mention and their neighbours, which is
+    enough to find a gap between bounds. Without packaging installed only
+    clashing == pins are detected.
+    """
+    try:
+        from packaging.specifiers import SpecifierSet, InvalidSpecifier
+        from packaging.version import Version, InvalidVersion
+    except ImportError:
+        return len({s for s in specifiers if s.startswith('==')}) <= 1
+
+    try:
+        spec_set = SpecifierSet(','.join(s for s in specifiers if s))
+    except InvalidSpecifier:
+        return False
+    candidates = [Version('0'), Version('99999')]
+    for spec in spec_set:
+        if spec.operator == '===':
+            return True
+        try:
+            version = Version(spec.version.replace('.*', ''))
+        except InvalidVersion:
+            return False
+        release = list(version.release)
+        candidates.append(version)
+        candidates.append(Version('.'.join(map(str, release + [1]))))
+        candidates.append(Version('.'.join(map(str, release[:-1] + [release[-1] + 1]))))
+        if release[-1] > 0:
+            candidates.append(Version('.'.join(map(str, release[:-1] + [release[-1] - 1, 99999]))))
+    return any(spec_set.contains(candidate, prereleases=True) for candidate in candidates)
+
+def merge_node_requirements(nodes):
+    """Merge the requirements.txt files of several nodes into one requirement set.
+
+    Returns (lines, conflicts). Specifiers for the same package are combined into a
+    single requirement; packages whose combined specifiers no version can satisfy
+    are left out of lines and reported in conflicts as {package: {node: spec}}.
+    """
+    options, passthrough = [], []
+    specs = {}  # normalized name -> {'name': name, 'specs': {node name: specifier}}
+
+    for node in nodes:
+        node_dir = os.path.join(CUSTOM_NODES_DIR, node['folder_name'])
+        requirements_file = os.path.join(node_dir, 'requirements.txt')
+        if not os.path.exists(requirements_file):
+            continue
+        with open(requirements_file, 'r', errors='replace') as f:
+            for raw_line in f:
+                line = raw_line.split(' #', 1)[0].strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith(('-r ', '-c ', '-e ', '--requirement', '--constraint', '--editable')):
+                    flag, _, target = line.partition(' ')
+                    target = target.strip()
+                    if not target.startswith(('git+', 'http')) and not os.path.isabs(target):
+                        target = os.path.join(node_dir, target)
+                    passthrough.append(f"{flag} {target}")
+                    continue
+                if line.startswith('-'):
+                    if line not in options:
+                        options.append(line)
+                    continue
+                match = _REQUIREMENT_NAME_RE.match(line)
+                if not match or '[' in line or ';' in line or '@' in line:
+                    if line not in passthrough:
+                        passthrough.append(line)
+                    continue
+                name, specifier = match.group(1), match.group(2).replace(' ', '')
+                key = re.sub(r'[-_.]+', '-', name).lower()
+                specs.setdefault(key, {'name': name, 'specs': {}})['specs'][node['name']] = specifier
+
+    lines, conflicts = list(options), {}
+    for key, entry in sorted(specs.items()):
+        combined = sorted({s for s in entry['specs'].values() if s})
+        if not specifiers_satisfiable(combined):
+            conflicts[entry['name']] = entry['specs']
+            continue
+        lines.append(entry['name'] + ','.join(combined))
+    lines.extend(passthrough)
+    return lines, conflicts
+
+def pip_install_requirements(lines):
+    """Install a merged requirement set into the ComfyUI venv with a single pip resolve"""
+    with tempfile.NamedTemporaryFile('w', prefix='comfyui-node-requirements-', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(lines) + '\n')
+        requirements_file = f.name
+    try:
+        process = subprocess.Popen(
+            [f"{COMFYUI_DIR}/.venv/bin/python", '-m', 'pip', 'install', '-r', requirements_file],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            start_new_session=True
+        )
+        job_scheduler.track_process(process)
+        stream_output(process)
+        return process.wait() == 0
+    finally:
+        os.remove(requirements_file)
+
+@timed_install('nodes', mode='individual')
+def install_individual_nodes(node_ids):
+    """Install specific custom nodes by their IDs.
+
+    Nodes are shallow-cloned in parallel, then all of their requirements are
+    installed with one pip resolve.
+    """
+    global output_log
+    
+    try:
+        # First fetch the script to get node information
+        script_content = fetch_manifest(NODES_SCRIPT)
+        
+        if script_content is None:
+            output_log.put("Failed to fetch node installation script from GitHub")
+            return False
+        
+        # Parse nodes and filter by selected IDs
+        all_nodes = parse_nodes_from_script(script_content)
+        selected_nodes = [node for node in all_nodes if node['id'] in node_ids]
+        
+        if not selected_nodes:
+            output_log.put("No valid nodes selected for installation")
+            return False
+        
+        total = len(selected_nodes)
+        output_log.put(f"Installing {total} custom nodes ({NODE_CLONE_CONCURRENCY} clones at a time)...")
+        os.makedirs(CUSTOM_NODES_DIR, exist_ok=True)
+        
+        cloned_nodes, failed = [], []
+        job = job_scheduler.current_job()
+        
+        def clone(node):
+            check_job_cancelled(job)
+            return clone_node(node, job)
+        
+        with ThreadPoolExecutor(max_workers=max(1, NODE_CLONE_CONCURRENCY)) as pool:
+            futures = {pool.submit(clone, node): node for node in selected_nodes}
+            for done, future in enumerate(as_completed(futures), 1):
+                node = futures[future]
+                try:
+                    result = future.result()
+                    cloned_nodes.append(node)
+                    if result == 'exists':
+                        output_log.put(f"[{done}/{total}] ✓ {node['name']} already present")
+                    else:
+                        output_log.put(f"[{done}/{total}] ✓ {node['name']} cloned")
+                except subprocess.TimeoutExpired:
+                    failed.append(node['name'])
+                    output_log.put(f"[{done}/{total}] ✗ Clone of {node['name']} timed out")
+                except Exception as e:
+                    failed.append(node['name'])
+                    output_log.put(f"[{done}/{total}] ✗ Failed to clone {node['name']}: {str(e)}")
+                    logging.error(f"Node clone failed: {e}")
+        
+        check_job_cancelled(job)
+        lines, conflicts = merge_node_requirements(cloned_nodes)
+        for package, node_specs in conflicts.items():
+            pins = ', '.join(f"{name} wants {spec or 'any version'}" for name, spec in sorted(node_specs.items()))
+            output_log.put(f"✗ Requirement conflict on {package}: {pins} (skipped)")
+        
+        if lines:
+            output_log.put(f"Resolving {len(lines)} requirements for {len(cloned_nodes)} nodes in one pip install...")
+            if not pip_install_requirements(lines):
+                output_log.put("✗ pip install of node requirements failed")
+                return False
+            output_log.put("✓ Node requirements installed")
+        
+        if failed or conflicts:
+            output_log.put(f"Individual node installation finished with problems: {len(failed)} clone failures, {len(conflicts)} conflicts")
+            return False
+        
+        output_log.put("Individual node installation completed")
+        return True
+        
+    except Exception as e:
+        output_log.put(f"Node installation failed: {str(e)}")
+        logging.error(f"Individual nodes installation error: {e}")
+        return False
+
+@timed_install('models', mode='individual')
+def install_individual_models(model_ids):
+    """Install specific models by their IDs"""
+    global output_log
+    
+    try:
+        # First fetch the script to get model information
+        script_content = fetch_manifest(MODELS_SCRIPT)
+        
+        if script_content is None:
+            output_log.put("Failed to fetch model installation script from GitHub")
+            return False
+        
+        # Parse models and filter by selected IDs
+        all_models = parse_models_from_script(script_content)
+        selected_models = [model for model in all_models if model['id'] in model_ids]
+        
+        if not selected_models:
+            output_log.put("No valid models selected for installation")
+            return False
+        
+        output_log.put(f"Installing {len(selected_models)} models ({DOWNLOAD_CONCURRENCY} at a time)...")
+
+        downloads = []
+        for model in selected_models:
+            output_log.put(f"Downloading {model['name']} ({model['size']})...")
+            downloads.append({
+                'name': model['name'],
+                'url': model['url'],
+                'path': model_path(model),
+                'sha256': model['sha256']
+            })
+
+        failed = download_models(downloads)
+        if failed:
+            output_log.put(f"{len(failed)} of {len(downloads)} models failed: {', '.join(failed)}")
+            return False
+
+        output_log.put("Individual model installation completed")
+        return True
+        
+    except Exception as e:
+        output_log.put(f"Model installation failed: {str(e)}")
+        logging.error(f"Individual models installation error: {e}")
+        return False
+
+def repair_model_files():
+    """Check the catalog models a bundle script left on disk and re-fetch broken ones.
+
+    Installer scripts download with wget, so only the structural check applies
+    here; a truncated file is quarantined and downloaded again.
+    """
+    broken = []
+    for model in parse_models_from_script(fetch_manifest(MODELS_SCRIPT) or ''):
+        path = model_path(model)
+        problem = check_model_file(path) if os.path.exists(path) else None
+        if problem:
+            quarantine_model_file(path, problem)
+            broken.append({'name': model['name'], 'url': model['url'], 'path': path, 'sha256': model['sha256']})
+    if not broken:
+        return True
+    output_log.put(f"Re-fetching {len(broken)} broken models...")
+    return not download_models(broken)
+
+def store_catalog_models():
+    """Move the models a bundle script downloaded into the blob store.
+
+    Bundle scripts write plain files with wget, so every catalog folder is
+    deduplicated once the script is done. Returns the number of files stored.
+    """
+    dest_dirs = {model['dest_dir'] for model in parse_models_from_script(fetch_manifest(MODELS_SCRIPT) or '')}
+    count = sum(dedupe_model_files(dest_dir) for dest_dir in sorted(dest_dirs) if os.path.isdir(dest_dir))
+    if count:
+        output_log.put(f"✓ {count} model files linked into the model store")
+    return count
+
+# Disk preflight. Model sizes come from HEAD Content-Length, cached on disk per URL,
+# falling back to the size noted in the installer script. Nodes and ComfyUI have
+# no size to ask for, so they are budgeted with fixed estimates.
+_model_sizes = None
+_model_sizes_lock = threading.Lock()
+
+def _load_model_sizes():
+    """The URL -> {'size', 'checked'} cache, read from disk once. Caller holds the lock"""
+    global _model_sizes
+    if _model_sizes is None:
+        try:
+            with open(MODEL_SIZE_CACHE, 'r') as f:
+                _model_sizes = json.load(f)
+        except (OSError, ValueError):
+            _model_sizes = {}
+    return _model_sizes
+
+def cached_model_size(url):
+    with _model_sizes_lock:
+        entry = _load_model_sizes().get(url)
+    if entry and time.time() - entry['checked'] < MODEL_SIZE_TTL:
+        return entry['size']
+    return None
+
+def probe_model_sizes(models):
+    """HEAD every model whose size is not cached yet, PREFLIGHT_CONCURRENCY at a time"""
+    urls = {m['url'] for m in models if cached_model_size(m['url']) is None}
+    if not urls:
+        return
+    with ThreadPoolExecutor(max_workers=PREFLIGHT_CONCURRENCY) as pool:
+        sizes = dict(zip(urls, pool.map(lambda url: probe_download(url)['size'], urls)))
+    
+    with _model_sizes_lock:
+        cache = _load_model_sizes()
+        for url, size in sizes.items():
+            if size:
+                cache[url] = {'size': size, 'checked': time.time()}
+        os.makedirs(os.path.dirname(MODEL_SIZE_CACHE), exist_ok=True)
+        tmp_path = f"{MODEL_SIZE_CACHE}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, MODEL_SIZE_CACHE)
+
+def with_known_sizes(models):
+    """Copies of catalog models with size_bytes taken from the HEAD cache where known"""
+    sized = []
+    for model in models:
+        size = cached_model_size(model['url'])
+        sized.append(dict(model, size_bytes=size) if size else model)
+    return sized
+
+def _allocated_bytes(path):
+    """Bytes actually allocated to a (possibly sparse, partly downloaded) file"""
+    try:
+        return os.stat(path).st_blocks * 512
+    except OSError:
+        return 0
+
+def _model_need(model):
+    path = model_path(model)
+    if os.path.exists(path):
+        return 'present', 0
+    if model.get('sha256') and os.path.exists(blob_path(model['sha256'])):
+        return 'linked', 0
+    size = cached_model_size(model['url']) or model['size_bytes']
+    if not size:
+        return 'unknown', 0
+    return 'download', max(0, size - _allocated_bytes(path + '.part'))
+
+def plan_install(options):
+    """What an /install request would write: per-item bytes against free space"""
+    items = []
+    
+    if options.get('comfyui') and not os.path.exists(f"{COMFYUI_DIR}/main.py"):
+        items.append({'component': 'comfyui', 'name': 'ComfyUI', 'status': 'estimate', 'bytes': COMFYUI_DISK_ESTIMATE})
+    
+    if options.get('models'):
+        models = parse_models_from_script(fetch_manifest(MODELS_SCRIPT) or '')
+        selected = options.get('individual_models') or []
+        if selected:
+            models = [m for m in models if m['id'] in selected]
+        probe_model_sizes([m for m in models if _model_need(m)[0] != 'present'])
+        for model in models:
+            status, needed = _model_need(model)
+            items.append({'component': 'models', 'name': model['name'], 'status': status, 'bytes': needed})
+    
+    if options.get('nodes'):
+        nodes = parse_nodes_from_script(fetch_manifest(NODES_SCRIPT) or '')
+        selected = options.get('individual_nodes') or []
+        if selected:
+            nodes = [n for n in nodes if n['id'] in selected]
+        for node in nodes:
+            present = os.path.exists(os.path.join(CUSTOM_NODES_DIR, node['folder_name']))
+            items.append({
+                'component': 'nodes',
+                'name': node['name'],
+                'status': 'present' if present else 'estimate',
+                'bytes': 0 if present else NODE_DISK_ESTIMATE
+            })
+    
+    components = {}
+    for item in items:
+        components[item['component']] = components.get(item['component'], 0) + item['bytes']
+    total = sum(components.values())
+    free = shutil.disk_usage(WORKSPACE_DIR).free
+    reserved = job_scheduler.reserved_bytes()
+    return {
+        'items': items,
+        'components': components,
+        'total_bytes': total,
+        'unknown': sum(1 for item in items if item['status'] == 'unknown'),
+        'free_bytes': free,
+        'reserved_bytes': reserved,
+        'headroom_bytes': DISK_HEADROOM,
+        'fits': total <= free - reserved - DISK_HEADROOM
+    }
+
+def wait_for_disk_space(job):
+    """Hold a job until its planned bytes fit on the volume.
+
+    With on_full 'refuse' a job that no longer fits fails at once; with 'queue'
+    it waits, re-checking every DISK_RECHECK_INTERVAL seconds, until space is
+    freed or the job is cancelled.
+    """
+    announced = False
+    while True:
+        available = shutil.disk_usage(WORKSPACE_DIR).free - job_scheduler.reserved_bytes(exclude=job) - DISK_HEADROOM
+        if job.bytes <= available:
+            job_scheduler.admit(job)
+            return
+        message = f"{COMPONENT_LABELS[job.component]} needs {job.bytes / 1e9:.1f} GB but only {max(available, 0) / 1e9:.1f} GB is free"
+        if job.on_full != 'queue':
+            raise RuntimeError(message)
+        if not announced:
+            output_log.put(f"⏸️ {message}; waiting for space")
+            announced = True
+        if job.cancel_event.wait(DISK_RECHECK_INTERVAL):
+            raise JobCancelled()
+
+def get_runpod_id():
+    """Get RunPod instance ID from environment"""
+    return os.environ.get('RUNPOD_POD_ID', 'localhost')
+
+def check_component_status(component):
+    status_file = f"{STATUS_DIR}/{component}_status.json"
+    if os.path.exists(status_file):
+        try:
+            with open(status_file, 'r') as f:
+                return json.load(f)
+        except:
+            pass
+    return {"installed": False, "installing": False, "timestamp": None}
+
+def update_component_status(component, installed=False, installing=False):
+    status_file = f"{STATUS_DIR}/{component}_status.json"
+    status = {
+        "installed": installed,
+        "installing": installing,
+        "timestamp": datetime.now().isoformat()
+    }
+    with open(status_file, 'w') as f:
+        json.dump(status, f)
+    return status
+
+def probe_comfyui(http, port=COMFYUI_PORT):
+    """One health probe of ComfyUI's API: reachability, latency and queue depth"""
+    started = time.time()
+    try:
+        response = http.get(f'http://localhost:{port}/api/prompt', timeout=2)
+        comfyui_probe_duration.observe(time.time() - started)
+        if response.status_code != 200:
+            return {'ok': False}
+        queue_depth = response.json().get('exec_info', {}).get('queue_remaining')
+        return {'ok': True, 'latency_ms': (time.time() - started) * 1000, 'queue_depth': queue_depth}
+    except (requests.RequestException, ValueError):
+        return {'ok': False}
+
+def _comfyui_port_open(port):
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+class ComfyUIMonitor:
+    """Owns ComfyUI's health state so status requests never probe it themselves.
+
+    While ComfyUI starts, its output is followed for the "To see the GUI" banner
+    and the port is probed with exponential backoff; the HTTP API is only checked
+    once either says ComfyUI may be up. Clients can block in wait() until the
+    state leaves 'starting'. Once ready, a single background prober keeps the
+    state, latency and queue depth current over a keep-alive session.
+    """
+
+    def __init__(self, port=COMFYUI_PORT):
+        self.port = port
+        self.condition = threading.Condition()
+        self.state = 'stopped'  # stopped, starting, ready, unresponsive, exited, timeout
+        self.generation = 0
+        self.pid = None
+        self.started_at = None
+        self.ready_at = None
+        self.last_seen = None
+        self.latency_ms = None
+        self.queue_depth = None
+        self.http = requests.Session()
+
+    def watch(self, process, log_path):
+        """Start following a freshly spawned ComfyUI process"""
+        with self.condition:
+            self.generation += 1
+            self._set_state('starting')
+            self.pid = process.pid
+            self.started_at = time.time()
+            self.ready_at = self.last_seen = self.latency_ms = self.queue_depth = None
+            generation = self.generation
+        banner = threading.Event()
+        threading.Thread(target=self._follow_output, args=(process, log_path, banner), daemon=True).start()
+        threading.Thread(target=self._run_prober, args=(generation, process, banner), daemon=True).start()
+
+    def stop(self):
+        with self.condition:
+            self.generation += 1
+            self._set_state('stopped')
+
+    def wait(self, timeout):
+        """Block while ComfyUI is starting or unresponsive, up to timeout seconds"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.state not in ('starting', 'unresponsive'), timeout)
+
+    def status(self):
+        with self.condition:
+            now = time.time()
+            return {
+                'ready': self.state == 'ready',
+                'state': self.state,
+                'pid': self.pid,
+                'startup_seconds': (self.ready_at - self.started_at) if self.ready_at else None,
+                'uptime_seconds': (now - self.ready_at) if self.ready_at and self.state in ('ready', 'unresponsive') else None,
+                'last_seen_seconds_ago': (now - self.last_seen) if self.last_seen else None,
+                'latency_ms': self.latency_ms,
+                'queue_depth': self.queue_depth
+            }
+
+    def _set_state(self, state):
+        self.state = state
+        self.condition.notify_all()
+
+    def _follow_output(self, process, log_path, banner):
+        with open(log_path, 'wb') as log:
+            for line in iter(process.stdout.readline, b''):
+                log.write(line)
+                log.flush()
+                if not banner.is_set() and COMFYUI_READY_BANNER in line:
+                    banner.set()
+
+    def _record(self, generation, probe):
+        with self.condition:
+            if generation != self.generation:
+                return False
+            if probe['ok']:
+                self.last_seen = time.time()
+                self.latency_ms = probe['latency_ms']
+                self.queue_depth = probe['queue_depth']
+            return True
+
+    def _run_prober(self, generation, process, banner):
+        delay = COMFYUI_PROBE_MIN_DELAY
+        deadline = time.time() + COMFYUI_START_TIMEOUT
+        state = None
+        while state is None:
+            # wakes immediately when the banner is printed
+            banner.wait(delay)
+            if process.poll() is not None:
+                state = 'exited'
+            elif banner.is_set() or _comfyui_port_open(self.port):
+                probe = probe_comfyui(self.http, self.port)
+                if not self._record(generation, probe):
+                    return
+                if probe['ok']:
+                    state = 'ready'
+            if state is None and time.time() > deadline:
+                state = 'timeout'
+            delay = COMFYUI_PROBE_MIN_DELAY if banner.is_set() else min(delay * 2, COMFYUI_PROBE_MAX_DELAY)
+
+        with self.condition:
+            if generation != self.generation:
+                return
+            if state == 'ready':
+                self.ready_at = time.time()
+                comfyui_startup_duration.observe(self.ready_at - self.started_at)
+            self._set_state(state)
+        if state != 'ready':
+            return
+
+        failures = 0
+        while True:
+            time.sleep(COMFYUI_HEALTH_INTERVAL)
+            if process.poll() is not None:
+                state = 'exited'
+            else:
+                probe = probe_comfyui(self.http, self.port)
+                if not self._record(generation, probe):
+                    return
+                failures = 0 if probe['ok'] else failures + 1
+                state = 'unresponsive' if failures >= COMFYUI_HEALTH_FAILURES else 'ready'
+            with self.condition:
+                if generation != self.generation:
+                    return
+                if state != self.state:
+                    self._set_state(state)
+            if state == 'exited':
+                return
+
+def spawn_comfyui(port, output_dir, gpu=None):
+    """Start a ComfyUI process from the workspace venv on the given port"""
+    env = os.environ.copy()
+    env['HF_HOME'] = '/workspace'
+    env['HF_HUB_ENABLE_HF_TRANSFER'] = '1'
+    if gpu is not None:
+        env['CUDA_VISIBLE_DEVICES'] = str(gpu)
+    
+    # Start ComfyUI using the virtual environment
+    return subprocess.Popen([
+        f'{COMFYUI_DIR}/.venv/bin/python',
+        'main.py',
+        '--listen', '0.0.0.0',
+        '--port', str(port),
+        '--output-directory', output_dir
+    ], cwd=COMFYUI_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+class ArtistSession:
+    """One artist's ComfyUI process with its own port, GPU and readiness monitor.
+
+    artist is None while the process sits pre-warmed waiting to be adopted.
+    """
+
+    def __init__(self, artist, port, gpu):
+        self.artist = artist
+        self.port = port
+        self.gpu = gpu
+        self.process = None
+        self.monitor = ComfyUIMonitor(port)
+        self.started_at = datetime.now()
+        self.prefetch = None
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def to_dict(self):
+        return {
+            'artist': self.artist,
+            'port': self.port,
+            'gpu': self.gpu,
+            'pid': self.process.pid if self.process else None,
+            'running': self.running(),
+            'started_at': self.started_at.isoformat(),
+            'comfyui': self.monitor.status(),
+            'prefetch': self.prefetch
+        }
+
+def point_output_link(port, output_dir):
+    """Atomically point the output link a ComfyUI on this port writes through at output_dir"""
+    link = os.path.join(OUTPUT_LINK_DIR, f"comfyui-{port}")
+    os.makedirs(OUTPUT_LINK_DIR, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_link = f"{link}.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(output_dir, tmp_link)
+    os.replace(tmp_link, link)
+    return link
+
+class SessionManager:
+    """ComfyUI sessions keyed by artist.
+
+    Each session gets the next free port from COMFYUI_PORT upward and, when the
+    pod has GPUs, the GPU with the fewest sessions via CUDA_VISIBLE_DEVICES, so
+    several artists can share one multi-GPU pod.
+
+    ComfyUI writes through a per-port symlink rather than straight into the
+    artist's folder. That lets COMFYUI_PREWARM keep one idle ComfyUI booted
+    ahead of time: a new session adopts it by repointing the link, skipping
+    ComfyUI's startup entirely.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.warm = None
+        self.stopping = []  # sessions whose process is being shut down; they keep their port until it exits
+        self.lock = threading.Lock()
+        self._gpus = None
+
+    def gpus(self):
+        """GPU indices sessions are spread over: COMFYUI_GPUS, else what nvidia-smi reports"""
+        if self._gpus is None:
+            configured = os.environ.get('COMFYUI_GPUS')
+            if configured is not None:
+                self._gpus = [gpu.strip() for gpu in configured.split(',') if gpu.strip()]
+            else:
+                try:
+                    result = subprocess.run(
+                        ['nvidia-smi', '--query-gpu=index', '--format=csv,noheader'],
+                        capture_output=True, text=True, timeout=10
+                    )
+                    self._gpus = result.stdout.split() if result.returncode == 0 else []
+                except (OSError, subprocess.TimeoutExpired):
+                    self._gpus = []
+        return self._gpus
+
+    def get(self, artist):
+        with self.lock:
+            return self.sessions.get(artist)
+
+    def list(self):
+        with self.lock:
+            return list(self.sessions.values())
+
+    def _prune(self):
+        """Forget sessions whose ComfyUI has exited so their port and GPU can be reused. Caller holds the lock"""
+        for artist, session in list(self.sessions.items()):
+            if not session.running():
+                session.monitor.stop()
+                del self.sessions[artist]
+        if self.warm and not self.warm.running():
+            self.warm.monitor.stop()
+            self.warm = None
+
+    def _launch(self, artist, output_dir):
+        """Spawn ComfyUI on the next free port and GPU. Caller holds the lock"""
+        self._prune()
+        slots = list(self.sessions.values()) + self.stopping + ([self.warm] if self.warm else [])
+        used_ports = {s.port for s in slots}
+        free_ports = [p for p in range(COMFYUI_PORT, COMFYUI_PORT + COMFYUI_MAX_SESSIONS) if p not in used_ports]
+        if not free_ports:
+            raise RuntimeError(f"All {COMFYUI_MAX_SESSIONS} ComfyUI session slots are in use")
         
-        if not os.path.exists(script_path):
-            raise Exception(f"Installation script not found: {script_map[component]}")
+        gpu = None
+        if self.gpus():
+            load = {g: 0 for g in self.gpus()}
+            for s in slots:
+                if s.gpu in load:
+                    load[s.gpu] += 1
+            gpu = min(self.gpus(), key=lambda g: load[g])
+        
+        session = ArtistSession(artist, free_ports[0], gpu)
+        link = point_output_link(session.port, output_dir)
+        session.process = spawn_comfyui(session.port, link, gpu)
+        session.monitor.watch(session.process, f"{STATUS_DIR}/comfyui-{session.port}.log")
+        return session
+
+    def start(self, artist):
+        """Start (or return the running) session for an artist. Returns (session, started)"""
+        output_dir = os.path.join(OUTPUT_DIR, artist)
+        with self.lock:
+            session = self.sessions.get(artist)
+            if session and session.running():
+                sessions_started.inc(mode='rejoin')
+                return session, False
+            self.sessions.pop(artist, None)
+            
+            if self.warm and self.warm.running():
+                sessions_started.inc(mode='warm')
+                session, self.warm = self.warm, None
+                point_output_link(session.port, output_dir)
+                session.artist = artist
+                session.started_at = datetime.now()
+                output_log.put(f"{artist} adopted the pre-warmed ComfyUI on port {session.port}")
+            else:
+                session = self._launch(artist, output_dir)
+                sessions_started.inc(mode='cold')
+            self.sessions[artist] = session
+            return session, True
+
+    def prewarm(self):
+        """Boot an idle ComfyUI for the next session if pre-warming is on and a slot is free"""
+        if not COMFYUI_PREWARM or not os.path.exists(f"{COMFYUI_DIR}/main.py"):
+            return None
+        with self.lock:
+            if self.warm and self.warm.running():
+                return self.warm
+            self.warm = None
+            try:
+                self.warm = self._launch(None, WARM_OUTPUT_DIR)
+            except RuntimeError:
+                return None
+            output_log.put(f"Pre-warming ComfyUI on port {self.warm.port}")
+            return self.warm
+
+    def stop(self, artist, prewarm=True):
+        """Stop an artist's ComfyUI. Returns False if the artist has no session.
+
+        The session keeps its port until the process has exited, so a session
+        started meanwhile never gets a port the old ComfyUI still holds.
+        """
+        with self.lock:
+            session = self.sessions.pop(artist, None)
+            if session:
+                self.stopping.append(session)
+        if not session:
+            return False
+        try:
+            session.monitor.stop()
+            if session.running():
+                session.process.terminate()
+                try:
+                    session.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    session.process.kill()
+                    session.process.wait()
+        finally:
+            with self.lock:
+                self.stopping.remove(session)
+        idle_monitor.forget(session)
+        if prewarm:
+            self.prewarm()
+        return True
+
+    def stop_all(self):
+        for session in self.list():
+            self.stop(session.artist, prewarm=False)
+        with self.lock:
+            warm, self.warm = self.warm, None
+        if warm and warm.running():
+            warm.monitor.stop()
+            warm.process.terminate()
+
+session_manager = SessionManager()
+
+def stream_output(process, prefix=''):
+    """Stream process stdout and stderr to the output log as lines arrive.
+
+    Both pipes are multiplexed with a selector, so a chatty stderr can never fill
+    its pipe and stall the script while stdout is being read. Each line is stamped
+    with the time it was read and `prefix`, and stderr lines are tagged.
+
+    Returns the last few stderr lines, for error messages.
+    """
+    global output_log
+    selector = selectors.DefaultSelector()
+    pending = {}
+    stderr_tail = deque(maxlen=20)
+    for stream, tag in ((process.stdout, ''), (process.stderr, 'stderr: ')):
+        if stream is not None:
+            selector.register(stream.fileno(), selectors.EVENT_READ, tag)
+            pending[stream.fileno()] = b''
+
+    def emit(tag, raw_line):
+        # keep only the last redraw of progress bars that rewrite the line with \r
+        line = raw_line.decode('utf-8', 'replace').rstrip('\r').rsplit('\r', 1)[-1].strip()
+        if line:
+            output_log.put(f"[{datetime.now():%H:%M:%S}] {prefix}{tag}{line}")
+            if tag:
+                stderr_tail.append(line)
+
+    try:
+        while selector.get_map():
+            for key, _ in selector.select():
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    if pending[key.fd]:
+                        emit(key.data, pending[key.fd])
+                    continue
+                *lines, pending[key.fd] = (pending[key.fd] + chunk).split(b'\n')
+                for raw_line in lines:
+                    emit(key.data, raw_line)
+                if len(pending[key.fd]) > 65536:
+                    emit(key.data, pending[key.fd])
+                    pending[key.fd] = b''
+    finally:
+        selector.close()
+    return list(stderr_tail)
+
+def cached_installer_script(script):
+    """Path to an executable local copy of an installer script from the repo.
+
+    The script comes through the manifest cache, so installs reuse the copy the
+    admin panel already fetched and only send a conditional request when it is
+    stale. The file is only rewritten when its content changes.
+    """
+    content = fetch_manifest(script, revalidate=True)
+    if content is None:
+        raise Exception(f"Installation script not found: {script}")
+    
+    script_path = os.path.join(SCRIPT_CACHE_DIR, os.path.basename(script))
+    try:
+        with open(script_path, 'r') as f:
+            unchanged = f.read() == content
+    except OSError:
+        unchanged = False
+    
+    if not unchanged:
+        os.makedirs(SCRIPT_CACHE_DIR, exist_ok=True)
+        with open(script_path + '.tmp', 'w') as f:
+            f.write(content)
+        os.chmod(script_path + '.tmp', 0o755)
+        os.replace(script_path + '.tmp', script_path)
+    return script_path
+
+@timed_install()
+def run_installation_script(component):
+    """Run installation script for component"""
+    try:
+        update_component_status(component, installing=True)
         
-        os.chmod(script_path, 0o755)
+        output_log.put(f"Starting {component} installation...")
+        script_path = cached_installer_script(INSTALL_SCRIPTS[component])
         
-        current_process = subprocess.Popen(
+        process = subprocess.Popen(
             script_path,
             shell=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
+            bufsize=0,
+            start_new_session=True
         )
+        job_scheduler.track_process(process)
         
-        output_thread = threading.Thread(target=stream_output, args=(current_process,))
+        output_thread = threading.Thread(target=stream_output, args=(process,))
         output_thread.start()
         
-        current_process.wait()
+        process.wait()
         output_thread.join()
         
-        success = current_process.returncode == 0
+        success = process.returncode == 0
+        if success and component == 'models':
+            success = repair_model_files()
+            store_catalog_models()
         update_component_status(component, installed=success, installing=False)
         
-        # Cleanup
-        subprocess.run(f"rm -rf {temp_dir}", shell=True)
-        
         return success
         
     except Exception as e:
-        output_queue.put(f"ERROR: {str(e)}")
+        output_log.put(f"ERROR: {str(e)}")
         update_component_status(component, installed=False, installing=False)
         return False
-    finally:
-        installation_in_progress = False
-        current_process = None
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    """One installation step (comfyui, models or nodes) tracked by the scheduler"""
+
+    def __init__(self, job_id, component, target, depends_on, plan):
+        self.id = job_id
+        self.component = component
+        self.target = target
+        self.depends_on = depends_on
+        self.plan = plan
+        self.status = 'pending'
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.processes = []
+        self.bytes = 0  # disk space the job is planned to take
+        self.remaining = 0  # part of bytes not written yet, still held in reserve
+        self.admitted = False  # passed the disk check and may be writing
+        self.on_full = DISK_ADMISSION
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'component': self.component,
+            'plan': self.plan,
+            'status': self.status,
+            'bytes': self.bytes,
+            'reserved_bytes': self.remaining,
+            'depends_on': self.depends_on,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'duration': (self.finished or time.time()) - self.started if self.started else None
+        }
+
+class JobScheduler:
+    """Runs installation jobs as a dependency graph.
+
+    A job starts as soon as every job it depends on has succeeded, so models and
+    nodes (which depend only on comfyui) install in parallel. A job whose
+    dependency fails or is cancelled is skipped.
+    """
+
+    ACTIVE = ('pending', 'running')
+
+    def __init__(self, keep=100):
+        self.jobs = {}
+        self.keep = keep
+        self.lock = threading.RLock()
+        self.ids = itertools.count(1)
+        self.local = threading.local()
+        self.free_mark = None  # free disk space at the last settle
+
+    def busy(self):
+        with self.lock:
+            return any(job.status in self.ACTIVE for job in self.jobs.values())
+
+    def submit(self, steps, sizes=None, on_full=DISK_ADMISSION):
+        """Schedule a plan of (component, target, [components it depends on]) steps.
+
+        Dependencies resolve to a job in the same plan, or to a still-active job
+        for that component from an earlier plan. Raises ValueError if a component
+        is already scheduled. sizes maps components to the disk bytes they need.
+        """
+        with self.lock:
+            active = {job.component: job for job in self.jobs.values() if job.status in self.ACTIVE}
+            clashes = [component for component, _, _ in steps if component in active]
+            if clashes:
+                raise ValueError(f"Installation already in progress: {', '.join(clashes)}")
+            if not active:
+                output_log.start_job('install')
+
+            plan = f"plan-{next(self.ids)}"
+            created = {}
+            for component, target, depends_on in steps:
+                dependencies = [(created.get(c) or active.get(c)).id for c in depends_on if c in created or c in active]
+                job = Job(f"job-{next(self.ids)}", component, target, dependencies, plan)
+                job.bytes = job.remaining = (sizes or {}).get(component, 0)
+                job.on_full = on_full
+                self.jobs[job.id] = job
+                created[component] = job
+
+            finished = [job_id for job_id, job in self.jobs.items() if job.status not in self.ACTIVE]
+            for job_id in finished[:max(0, len(self.jobs) - self.keep)]:
+                del self.jobs[job_id]
+
+            self._dispatch()
+            return list(created.values())
+
+    def cancel(self, job_id):
+        """Cancel a pending or running job. Returns False if there is nothing to cancel"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.status not in self.ACTIVE:
+                return False
+            job.cancel_event.set()
+            output_log.put(f"Cancelling {job.component} installation ({job.id})...")
+            if job.status == 'pending':
+                self._finish(job, 'cancelled')
+            else:
+                for process in job.processes:
+                    _terminate_process_group(process)
+            return True
+
+    def current_job(self):
+        return getattr(self.local, 'job', None)
+
+    def reserved_bytes(self, exclude=None):
+        """Disk space promised to active jobs that they have not written yet"""
+        with self.lock:
+            self._settle()
+            return sum(j.remaining for j in self.jobs.values() if j.status in self.ACTIVE and j is not exclude)
+
+    def admit(self, job):
+        """Mark a job as cleared to write; space used from now on comes off its reservation"""
+        with self.lock:
+            self._settle()
+            job.admitted = True
+
+    def _settle(self):
+        """Take the space used since the last settle off the writing jobs' reservations. Caller holds the lock.
+
+        Written bytes already show up as lost free space, so leaving them reserved
+        too would count them twice and refuse later jobs too early.
+        """
+        free = shutil.disk_usage(WORKSPACE_DIR).free
+        if self.free_mark is not None:
+            written = max(0, self.free_mark - free)
+            writing = [j for j in self.jobs.values() if j.status == 'running' and j.admitted and j.remaining]
+            for job in sorted(writing, key=lambda j: j.started):
+                taken = min(job.remaining, written)
+                job.remaining -= taken
+                written -= taken
+        self.free_mark = free
+
+    def track_process(self, process, job=None):
+        """Register a subprocess of `job` (default: the calling job) so cancelling the job kills it"""
+        job = job or self.current_job()
+        if job:
+            job.processes.append(process)
+            if job.cancel_event.is_set():
+                _terminate_process_group(process)
+
+    def _dispatch(self):
+        changed = True
+        while changed:
+            changed = False
+            for job in list(self.jobs.values()):
+                if job.status != 'pending':
+                    continue
+                dependencies = [self.jobs[d] for d in job.depends_on if d in self.jobs]
+                if any(d.status in ('failed', 'cancelled', 'skipped') for d in dependencies):
+                    output_log.put(f"Skipping {job.component} installation: a dependency did not succeed")
+                    self._finish(job, 'skipped', dispatch=False)
+                    changed = True
+                elif all(d.status == 'succeeded' for d in dependencies):
+                    job.status = 'running'
+                    job.started = time.time()
+                    threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        self.local.job = job
+        status = 'failed'
+        try:
+            if job.bytes:
+                wait_for_disk_space(job)
+            status = 'succeeded' if job.target() else 'failed'
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            output_log.put(f"ERROR: {str(e)}")
+            logging.error(f"{job.component} job failed: {e}")
+        finally:
+            self.local.job = None
+        if job.cancel_event.is_set():
+            status = 'cancelled'
+        if job.admitted:
+            with self.lock:
+                self._settle()  # what it wrote last is its own, not the next job's
+        if status == 'failed':
+            output_log.put(f"{COMPONENT_LABELS[job.component]} installation failed")
+        elif status == 'cancelled':
+            output_log.put(f"{COMPONENT_LABELS[job.component]} installation cancelled")
+        with self.lock:
+            self._finish(job, status)
+
+    def _finish(self, job, status, dispatch=True):
+        job.status = status
+        job.finished = time.time()
+        plan_jobs = [j for j in self.jobs.values() if j.plan == job.plan]
+        if all(j.status not in self.ACTIVE for j in plan_jobs) and all(j.status == 'succeeded' for j in plan_jobs):
+            output_log.put('Installation completed successfully!')
+        if dispatch:
+            self._dispatch()
+        if not any(j.status in self.ACTIVE for j in self.jobs.values()):
+            output_log.end_job()
+
+def _terminate_process_group(process):
+    if process.poll() is None:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except OSError:
+            process.terminate()
+
+def check_job_cancelled(job):
+    if job and job.cancel_event.is_set():
+        raise JobCancelled()
+
+job_scheduler = JobScheduler()
+
+class IdleMonitor:
+    """Stops a forgotten pod's processes once nobody has used them for a while.
+
+    Every IDLE_SAMPLE_INTERVAL seconds it looks for activity: install jobs in
+    flight, prompts queued or finished on any artist's ComfyUI, and Jupyter
+    kernel activity. After IDLE_TIMEOUT seconds without any, it calls
+    cleanup_processes and then IDLE_STOP_COMMAND (e.g. a pod-stop call), after
+    a warning IDLE_WARNING seconds beforehand.
+    """
+
+    def __init__(self, timeout=IDLE_TIMEOUT, warning=IDLE_WARNING, jupyter_url=JUPYTER_URL, stop_command=IDLE_STOP_COMMAND):
+        self.timeout = timeout
+        self.warning = warning
+        self.jupyter_url = jupyter_url
+        self.stop_command = stop_command
+        self.lock = threading.Lock()
+        self.state = 'active' if timeout > 0 else 'disabled'  # active, warning, stopped, disabled
+        self.last_activity = time.time()
+        self.last_reason = 'manager started'
+        self.stopped_at = None
+        self.history_marks = {}  # artist session -> newest prompt id seen in its ComfyUI's history
+        self.jupyter_mark = None
+        self.http = requests.Session()
+
+    def touch(self, reason):
+        """Record activity now and cancel any pending warning"""
+        with self.lock:
+            self.last_activity = time.time()
+            self.last_reason = reason
+            if self.state in ('warning', 'stopped'):
+                self.state = 'active'
+                self.stopped_at = None
+
+    def _comfyui_activity(self, artist_session):
+        monitor = artist_session.monitor
+        if monitor.queue_depth:
+            return f"{artist_session.artist}'s ComfyUI is running prompts"
+        try:
+            response = self.http.get(f'http://localhost:{artist_session.port}/history', params={'max_items': 1}, timeout=2)
+            newest = next(iter(response.json()), None) if response.status_code == 200 else None
+        except (requests.RequestException, ValueError):
+            return None
+        seen = artist_session in self.history_marks
+        previous = self.history_marks.get(artist_session)
+        self.history_marks[artist_session] = newest
+        if newest and seen and newest != previous:
+            return f"{artist_session.artist} finished a prompt"
+        return None
+
+    def forget(self, artist_session):
+        """Drop a stopped session's history mark, so a session reusing its port starts fresh"""
+        self.history_marks.pop(artist_session, None)
+
+    def _jupyter_activity(self):
+        try:
+            kernels = self.http.get(f'{self.jupyter_url}/api/kernels', timeout=2).json()
+            status = self.http.get(f'{self.jupyter_url}/api/status', timeout=2).json()
+        except (requests.RequestException, ValueError):
+            return None
+        if any(k.get('execution_state') == 'busy' for k in kernels):
+            return 'a Jupyter kernel is busy'
+        # /api/status does not count itself as activity, so polling it is safe
+        previous, self.jupyter_mark = self.jupyter_mark, status.get('last_activity')
+        if self.jupyter_mark and previous is not None and self.jupyter_mark != previous:
+            return 'Jupyter was used'
+        return None
+
+    def sample(self):
+        """Look for activity once. Returns the reason found, or None"""
+        reason = None
+        if job_scheduler.busy():
+            reason = 'an install job is running'
+        for artist_session in session_manager.list():
+            if artist_session.running():
+                reason = self._comfyui_activity(artist_session) or reason
+        reason = self._jupyter_activity() or reason
+        if reason:
+            self.touch(reason)
+        return reason
+
+    def check(self, now=None):
+        """Warn or shut down if the idle window has passed. Returns the state"""
+        now = now or time.time()
+        with self.lock:
+            idle = now - self.last_activity
+            if self.state == 'active' and idle >= self.timeout - self.warning:
+                self.state = 'warning'
+                output_log.put(f"⚠️ No activity for {int(idle // 60)} min; stopping ComfyUI and Jupyter in {int((self.timeout - idle) // 60) + 1} min")
+            if self.state != 'warning' or idle < self.timeout:
+                return self.state
+            self.state = 'stopped'
+            self.stopped_at = now
+        output_log.put(f"💤 Idle for {int(idle // 60)} min, stopping sessions")
+        cleanup_processes()
+        if self.stop_command:
+            output_log.put(f"Running idle stop hook: {self.stop_command}")
+            try:
+                subprocess.run(self.stop_command, shell=True, timeout=120)
+            except (OSError, subprocess.SubprocessError) as e:
+                output_log.put(f"❌ Idle stop hook failed: {e}")
+        return 'stopped'
+
+    def status(self):
+        with self.lock:
+            idle = time.time() - self.last_activity
+            return {
+                'state': self.state,
+                'timeout': self.timeout,
+                'warning': self.warning,
+                'idle_seconds': int(idle),
+                'shutdown_in': max(0, int(self.timeout - idle)) if self.state in ('active', 'warning') else None,
+                'last_activity': datetime.fromtimestamp(self.last_activity).isoformat(),
+                'last_reason': self.last_reason,
+                'stop_command': bool(self.stop_command)
+            }
+
+    def run(self):
+        while self.state != 'disabled':
+            time.sleep(IDLE_SAMPLE_INTERVAL)
+            try:
+                self.sample()
+                if self.state != 'stopped':
+                    self.check()
+            except Exception as e:
+                logging.exception("Idle check failed: %s", e)
+
+idle_monitor = IdleMonitor()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.time()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_duration.observe(time.time() - started, route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for installs, downloads, sessions and HTTP latency"""
+    active_sessions.set(sum(1 for s in session_manager.list() if s.running()))
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -1366,11 +4505,9 @@ def get_available_nodes():
         return jsonify({'success': False, 'message': 'Not authenticated'})
     
     try:
-        github_url = "https://raw.githubusercontent.com/razvanmatei-sf/comfyui-runpod-manager/main/installer/install_nodes.sh"
-        response = requests.get(github_url, timeout=10)
+        script_content = fetch_manifest(NODES_SCRIPT)
         
-        if response.status_code == 200:
-            script_content = response.text
+        if script_content is not None:
             nodes = parse_nodes_from_script(script_content)
             return jsonify({'success': True, 'nodes': nodes})
         else:
@@ -1387,12 +4524,14 @@ def get_available_models():
         return jsonify({'success': False, 'message': 'Not authenticated'})
     
     try:
-        github_url = "https://raw.githubusercontent.com/razvanmatei-sf/comfyui-runpod-manager/main/installer/install_models.sh"
-        response = requests.get(github_url, timeout=10)
+        script_content = fetch_manifest(MODELS_SCRIPT)
         
-        if response.status_code == 200:
-            script_content = response.text
-            models = parse_models_from_script(script_content)
+        if script_content is not None:
+            inventory = model_inventory.scan()
+            models = []
+            for model in with_known_sizes(parse_models_from_script(script_content)):
+                info = inventory.get(os.path.relpath(model_path(model), MODELS_DIR))
+                models.append(dict(model, installed=bool(info) and not info['truncated'], problem=info['problem'] if info else None))
             return jsonify({'success': True, 'models': models})
         else:
             return jsonify({'success': False, 'message': 'Failed to fetch install script'})
@@ -1401,79 +4540,378 @@ def get_available_models():
         logging.error(f"Error fetching available models: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/models/inventory')
+def models_inventory():
+    """Every model file under models/ with its format, dtype, parameter count, size and integrity"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    inventory = model_inventory.scan()
+    files = [dict(info, path=rel, folder=rel.split(os.sep, 1)[0]) for rel, info in sorted(inventory.items())]
+    return jsonify({
+        'success': True,
+        'files': files,
+        'total_files': len(files),
+        'total_bytes': sum(f['size'] or 0 for f in files),
+        'truncated': sum(1 for f in files if f['truncated']),
+        'scanned_at': datetime.fromtimestamp(model_inventory.scanned_at).isoformat()
+    })
+
+@app.route('/api/models/tier')
+def models_tier():
+    """Models kept on local disk, the tier budget and per-model usage counts"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    return jsonify(dict(model_tier.status(), success=True))
+
+@app.route('/api/models/tier/<action>', methods=['POST'])
+def models_tier_action(action):
+    """Promote a model to local disk or evict it, by its path under models/"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    if action not in ('promote', 'evict'):
+        return jsonify({'success': False, 'message': f'Unknown action {action}'}), 404
+    
+    path = os.path.normpath(os.path.join(MODELS_DIR, request.json.get('path', '')))
+    if not path.startswith(MODELS_DIR + os.sep) or not path.endswith(MODEL_EXTENSIONS):
+        return jsonify({'success': False, 'message': 'Invalid path'}), 400
+    try:
+        done = model_tier.promote(path) if action == 'promote' else model_tier.evict(path)
+    except OSError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    return jsonify(dict(model_tier.status(), success=done))
+
+@app.route('/model_store')
+def model_store():
+    """Report how much space the content-addressed model store saves"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    stats = model_store_stats()
+    return jsonify({
+        'success': True,
+        'logical_bytes': stats['logical_bytes'],
+        'stored_bytes': stats['stored_bytes'],
+        'bytes_saved': stats['bytes_saved'],
+        'blobs': stats['blobs'],
+        'unreferenced_blobs': len(stats['unreferenced_blobs']),
+        'unreferenced_bytes': sum(blob['size'] for blob in stats['unreferenced_blobs'])
+    })
+
+@app.route('/model_store/dedupe', methods=['POST'])
+def model_store_dedupe():
+    """Move existing model files into the store in the background"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    def run_dedupe():
+        output_log.put("Deduplicating model files...")
+        count = dedupe_model_files()
+        stats = model_store_stats()
+        output_log.put(f"✓ {count} model files in store, {stats['bytes_saved'] / 1024**3:.1f} GB saved")
+    
+    threading.Thread(target=run_dedupe, daemon=True).start()
+    return jsonify({'success': True})
+
+@app.route('/model_store/gc', methods=['POST'])
+def model_store_gc():
+    """Delete blobs that no model file links to any more"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    removed, freed = gc_model_store()
+    return jsonify({'success': True, 'removed_blobs': removed, 'freed_bytes': freed})
+
 @app.route('/install', methods=['POST'])
 def install():
     if not session.get('authenticated'):
         return jsonify({'success': False, 'message': 'Not authenticated'})
     
-    if installation_in_progress:
-        return jsonify({'success': False, 'message': 'Installation already in progress'})
-    
     options = request.json
+    steps = []
     
-    def run_installations():
-        try:
-            if options.get('comfyui'):
-                success = run_installation_script('comfyui')
-                if not success:
-                    output_queue.put('ComfyUI installation failed')
-                    return
-            
-            if options.get('models'):
-                # Check if individual models are specified
-                individual_models = options.get('individual_models', [])
-                if individual_models:
-                    success = install_individual_models(individual_models)
-                else:
-                    success = run_installation_script('models')
-                    
-                if not success:
-                    output_queue.put('Models installation failed')
-                    return
-            
-            if options.get('nodes'):
-                # Check if individual nodes are specified
-                individual_nodes = options.get('individual_nodes', [])
-                if individual_nodes:
-                    success = install_individual_nodes(individual_nodes)
-                else:
-                    success = run_installation_script('nodes')
-                    
-                if not success:
-                    output_queue.put('Nodes installation failed')
-                    return
-            
-            output_queue.put('Installation completed successfully!')
-        except Exception as e:
-            output_queue.put(f'Installation failed: {str(e)}')
+    if options.get('comfyui'):
+        steps.append(('comfyui', lambda: run_installation_script('comfyui'), []))
+    
+    if options.get('models'):
+        # Check if individual models are specified
+        individual_models = options.get('individual_models', [])
+        if individual_models:
+            steps.append(('models', lambda: install_individual_models(individual_models), ['comfyui']))
+        else:
+            steps.append(('models', lambda: run_installation_script('models'), ['comfyui']))
+    
+    if options.get('nodes'):
+        # Check if individual nodes are specified
+        individual_nodes = options.get('individual_nodes', [])
+        if individual_nodes:
+            steps.append(('nodes', lambda: install_individual_nodes(individual_nodes), ['comfyui']))
+        else:
+            steps.append(('nodes', lambda: run_installation_script('nodes'), ['comfyui']))
+    
+    if not steps:
+        return jsonify({'success': False, 'message': 'Nothing selected to install'})
+    
+    plan = plan_install(options)
+    on_full = options.get('on_full') or DISK_ADMISSION
+    if not plan['fits'] and on_full != 'queue':
+        available = max(plan['free_bytes'] - plan['reserved_bytes'] - plan['headroom_bytes'], 0)
+        return jsonify({
+            'success': False,
+            'message': f"Not enough disk space: needs {plan['total_bytes'] / 1e9:.1f} GB, {available / 1e9:.1f} GB available",
+            'preflight': plan
+        })
+    
+    try:
+        jobs = job_scheduler.submit(steps, plan['components'], on_full)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
     
-    thread = threading.Thread(target=run_installations)
-    thread.start()
+    return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs], 'preflight': plan})
+
+@app.route('/install/preflight', methods=['POST'])
+def install_preflight():
+    """Bytes each selected item would write, against free space, before installing"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    try:
+        return jsonify(dict(plan_install(request.json), success=True))
+    except Exception as e:
+        logging.error(f"Install preflight failed: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/jobs')
+def list_jobs():
+    """Status of recent installation jobs, newest first"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    with job_scheduler.lock:
+        jobs = [job.to_dict() for job in reversed(list(job_scheduler.jobs.values()))]
+    return jsonify({'success': True, 'busy': job_scheduler.busy(), 'jobs': jobs})
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    job = job_scheduler.jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
     
+    if not job_scheduler.cancel(job_id):
+        return jsonify({'success': False, 'message': 'Job is not pending or running'})
     return jsonify({'success': True})
 
 @app.route('/terminal_output')
 def terminal_output():
-    """Get terminal output for admin interface"""
-    global output_queue, installation_in_progress
+    """Get terminal output for admin interface.
+
+    Returns lines after the `since` cursor (or this browser session's last cursor)
+    without consuming them, so other readers still see them.
+    """
+    global output_log
     
-    output_lines = []
     try:
-        while True:
-            line = output_queue.get_nowait()
-            output_lines.append(line)
-    except:
-        pass
+        since = int(request.args.get('since', session.get('output_cursor', 0)))
+    except ValueError:
+        since = 0
+    since = output_log.clamp(since)
+    
+    output_lines = output_log.read(since)
+    cursor = output_lines[-1][0] if output_lines else since
+    session['output_cursor'] = cursor
     
     return jsonify({
-        'output': '\n'.join(output_lines) if output_lines else '',
-        'installation_complete': not installation_in_progress,
+        'output': '\n'.join(text for _, text in output_lines),
+        'cursor': cursor,
+        'installation_complete': not job_scheduler.busy(),
         'success': True
     })
 
+@app.route('/terminal_stream')
+def terminal_stream():
+    """Stream terminal output as Server-Sent Events.
+
+    Each line's sequence number is its event id, so a reconnecting EventSource
+    resumes after the last line it saw via Last-Event-ID.
+    """
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    
+    try:
+        cursor = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        cursor = 0
+    cursor = output_log.clamp(cursor)
+    
+    def events(cursor):
+        complete = None
+        yield 'retry: 2000\n\n'
+        while True:
+            for seq, text in output_log.read(cursor, limit=500):
+                cursor = seq
+                data = '\n'.join(f"data: {line}" for line in str(text).split('\n'))
+                yield f"id: {seq}\n{data}\n\n"
+            if complete != (not job_scheduler.busy()):
+                complete = not job_scheduler.busy()
+                yield f"event: status\ndata: {json.dumps({'installation_complete': complete})}\n\n"
+            if not output_log.wait(cursor, OUTPUT_STREAM_HEARTBEAT):
+                yield ': keep-alive\n\n'
+    
+    return Response(events(cursor), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/terminal_history')
+def terminal_history():
+    """List install job logs, or page through one by byte offset"""
+    if not session.get('authenticated'):
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+    
+    job_id = request.args.get('job')
+    if not job_id:
+        return jsonify({'success': True, 'jobs': output_log.jobs()})
+    
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = min(int(request.args.get('limit', 200)), 5000)
+        return jsonify(dict(output_log.page(job_id, offset, limit), success=True))
+    except (ValueError, OSError) as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def page_args(default=100):
+    offset = max(int(request.args.get('offset', 0)), 0)
+    limit = min(max(int(request.args.get('limit', default)), 1), OUTPUT_PAGE_LIMIT)
+    return offset, limit
+
+@app.route('/api/artists')
+def api_artists():
+    """Artists with their output count, size and latest output time. Served from the catalog"""
+    try:
+        offset, limit = page_args()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'offset and limit must be integers'}), 400
+    names = output_catalog.names()
+    artists = [output_catalog.summary(name) for name in names[offset:offset + limit]]
+    return jsonify({
+        'success': True,
+        'total': len(names),
+        'offset': offset,
+        'limit': limit,
+        'artists': [a for a in artists if a],
+        'scanned_at': datetime.fromtimestamp(output_catalog.scanned_at).isoformat() if output_catalog.scanned_at else None
+    })
+
+@app.route('/api/artists/<name>/outputs')
+def api_artist_outputs(name):
+    """One page of an artist's outputs, newest first. Served from the catalog"""
+    try:
+        offset, limit = page_args()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'offset and limit must be integers'}), 400
+    page = output_catalog.outputs(name, offset, limit)
+    if page is None:
+        return jsonify({'success': False, 'message': f'No outputs for {name}'}), 404
+    for output in page['outputs']:
+        output['url'] = url_for('artist_output_file', name=name, relpath=output['path'])
+        if output['path'].lower().endswith(THUMB_SOURCE_TYPES):
+            output['thumbnail'] = url_for('artist_output_thumbnail', name=name, relpath=output['path'])
+    return jsonify(dict(page, success=True, offset=offset, limit=limit, artist=output_catalog.summary(name)))
+
+@app.route('/api/artists/<name>/files/<path:relpath>')
+def artist_output_file(name, relpath):
+    """A full-size output file, with conditional and range request support"""
+    if artist_output_path(name, relpath) is None:
+        return jsonify({'success': False, 'message': 'Invalid path'}), 404
+    return send_from_directory(os.path.join(OUTPUT_DIR, name), relpath, max_age=THUMB_MAX_AGE)
+
+@app.route('/api/artists/<name>/thumbnails/<path:relpath>')
+def artist_output_thumbnail(name, relpath):
+    """A downscaled preview of an output image (?size=, ?format=webp|jpeg)"""
+    source = artist_output_path(name, relpath)
+    if source is None or not source.lower().endswith(THUMB_SOURCE_TYPES):
+        return jsonify({'success': False, 'message': 'Not an output image'}), 404
+    try:
+        st = os.stat(source)
+    except OSError:
+        return jsonify({'success': False, 'message': 'Not found'}), 404
+    try:
+        size = int(request.args.get('size', THUMB_DEFAULT_SIZE))
+    except ValueError:
+        size = THUMB_DEFAULT_SIZE
+    size = min(THUMB_SIZES, key=lambda s: abs(s - size))
+    
+    try:
+        fmt = thumbnail_format(request.args.get('format'))
+        key = thumbnail_cache.key(source, st, size, fmt)
+        if request.if_none_match.contains(key):
+            response = Response(status=304)
+        else:
+            key, path = thumbnail_cache.get(source, st, size, fmt)
+            response = send_from_directory(os.path.dirname(path), os.path.basename(path), etag=False)
+    except ImportError:
+        return jsonify({'success': False, 'message': 'Thumbnails need Pillow installed'}), 501
+    except (OSError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Cannot render thumbnail: {e}'}), 422
+    
+    response.set_etag(key)
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = THUMB_MAX_AGE
+    return response
+
+@app.route('/api/artists/<name>/export')
+def export_artist_outputs(name):
+    """Stream an artist's outputs as one archive.
+
+    ?format=tar (default, resumable with Range) or zip; ?since= and ?until= take
+    YYYY-MM-DD dates (until is inclusive); ?glob= may be repeated, e.g. *.png.
+    """
+    try:
+        since = datetime.strptime(request.args['since'], '%Y-%m-%d').timestamp() if request.args.get('since') else None
+        until = (datetime.strptime(request.args['until'], '%Y-%m-%d').timestamp() + 86400) if request.args.get('until') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'since and until must be YYYY-MM-DD'}), 400
+    if output_catalog.files(name) is None:
+        return jsonify({'success': False, 'message': f'No outputs for {name}'}), 404
+    plan = plan_export(name, since, until, request.args.getlist('glob'))
+    suffix = '-'.join(filter(None, [request.args.get('since'), request.args.get('until')]))
+    filename = f"{name}-outputs{'-' + suffix if suffix else ''}"
+    
+    if request.args.get('format') == 'zip':
+        response = Response(stream_zip(name, plan), mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+        return response
+    
+    total = tar_length(name, plan)
+    etag = export_etag(name, plan)
+    span = request.range.range_for_length(total) if request.range else None
+    if span and request.if_range.etag and request.if_range.etag != etag:
+        span = None  # the outputs changed since the partial download began
+    start, stop = span or (0, total)
+    
+    response = Response(stream_tar(name, plan, start, stop), mimetype='application/x-tar', direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.tar"'
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.content_length = stop - start
+    response.set_etag(etag)
+    if span:
+        response.status_code = 206
+        response.content_range = ContentRange('bytes', start, stop, total)
+    return response
+
 @app.route('/start_session', methods=['POST'])
 def start_session():
-    global artist_name, comfyui_process, jupyter_process, session_start_time, comfyui_ready
+    global jupyter_process
     
     try:
         data = request.get_json()
@@ -1481,14 +4919,8 @@ def start_session():
         
         if not name:
             return jsonify({'success': False, 'message': 'Artist name required'})
-        
-        artist_name = name
-        session_start_time = datetime.now()
-        comfyui_ready = False
-        
-        # Create output directory
-        output_dir = f"/workspace/output/{artist_name}"
-        os.makedirs(output_dir, exist_ok=True)
+        if '/' in name or name.startswith('.'):
+            return jsonify({'success': False, 'message': 'Invalid artist name'})
         
         # Start Jupyter Lab
         if not jupyter_process or jupyter_process.poll() is not None:
@@ -1502,41 +4934,73 @@ def start_session():
                 '--NotebookApp.password='
             ], cwd='/workspace')
         
-        # Start ComfyUI
-        if not comfyui_process or comfyui_process.poll() is not None:            
-            env = os.environ.copy()
-            env['HF_HOME'] = '/workspace'
-            env['HF_HUB_ENABLE_HF_TRANSFER'] = '1'
-            
-            artist_output_dir = f"/workspace/output/{artist_name}"
-            
-            # Start ComfyUI using the virtual environment
-            comfyui_process = subprocess.Popen([
-                '/workspace/ComfyUI/.venv/bin/python',
-                'main.py',
-                '--listen', '0.0.0.0',
-                '--port', '8188',
-                '--output-directory', artist_output_dir
-            ], cwd='/workspace/ComfyUI', env=env)
-            
-            def monitor_comfyui():
-                time.sleep(5)
-                for _ in range(30):
-                    if check_comfyui_ready():
-                        break
-                    time.sleep(1)
-            
-            threading.Thread(target=monitor_comfyui, daemon=True).start()
+        # Start (or rejoin) this artist's ComfyUI
+        artist_session, started = session_manager.start(name)
+        if started and PREFETCH_ENABLED:
+            threading.Thread(target=prefetch_session_models, args=(artist_session,), daemon=True).start()
+        idle_monitor.touch(f'{name} started a session')
         
-        return jsonify({'success': True, 'message': f'Session started for {artist_name}'})
+        return jsonify({
+            'success': True,
+            'message': f'Session started for {name}' if started else f'Rejoined session for {name}',
+            'port': artist_session.port,
+            'gpu': artist_session.gpu
+        })
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/comfyui_status')
 def comfyui_status():
-    """Check if ComfyUI is ready"""
-    return jsonify({'ready': check_comfyui_ready()})
+    """Check if an artist's ComfyUI is ready.
+
+    Answers from the session monitor's cached state. With ?wait=N the request is
+    held for up to N seconds while ComfyUI is still starting or unresponsive.
+    """
+    artist_session = session_manager.get(request.args.get('artist', ''))
+    if artist_session is None:
+        sessions = session_manager.list()
+        artist_session = sessions[0] if len(sessions) == 1 else None
+    if artist_session is None:
+        return jsonify({'ready': False, 'state': 'stopped'})
+    
+    try:
+        wait = min(float(request.args.get('wait', 0)), 60)
+    except ValueError:
+        wait = 0
+    if wait > 0:
+        artist_session.monitor.wait(wait)
+    return jsonify(dict(artist_session.monitor.status(), port=artist_session.port, prefetch=artist_session.prefetch))
+
+@app.route('/sessions')
+def list_sessions():
+    """All artist sessions on this pod"""
+    warm = session_manager.warm
+    return jsonify({
+        'success': True,
+        'gpus': session_manager.gpus(),
+        'max_sessions': COMFYUI_MAX_SESSIONS,
+        'sessions': [s.to_dict() for s in session_manager.list()],
+        'warm': warm.to_dict() if warm else None
+    })
+
+@app.route('/sessions/<artist>/stop', methods=['POST'])
+def stop_session(artist):
+    """Stop one artist's ComfyUI without touching the other sessions"""
+    if not session_manager.stop(artist):
+        return jsonify({'success': False, 'message': f'No session for {artist}'})
+    return jsonify({'success': True, 'message': f'Session stopped for {artist}'})
+
+@app.route('/idle_status')
+def idle_status():
+    """Idle shutdown state: seconds idle, time left and the last activity seen"""
+    return jsonify(dict(idle_monitor.status(), success=True))
+
+@app.route('/idle_status/keepalive', methods=['POST'])
+def idle_keepalive():
+    """An artist answered the idle warning; restart the idle window"""
+    idle_monitor.touch('keep-alive from the UI')
+    return jsonify(dict(idle_monitor.status(), success=True))
 
 @app.route('/terminate', methods=['POST'])
 def terminate():
@@ -1550,9 +5014,8 @@ def terminate():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
 def cleanup_processes():
-    global comfyui_process, jupyter_process
-    if comfyui_process:
-        comfyui_process.terminate()
+    global jupyter_process
+    session_manager.stop_all()
     if jupyter_process:
         jupyter_process.terminate()
 
@@ -1560,10 +5023,41 @@ def signal_handler(sig, frame):
     cleanup_processes()
     sys.exit(0)
 
+def serve(host='0.0.0.0', port=MANAGER_PORT, threads=MANAGER_THREADS):
+    """Serve the app with waitress, falling back to Flask's threaded server.
+
+    The manager keeps its jobs, output log and process handles in memory, so it
+    always runs as a single process; concurrency comes from the thread pool.
+    Long-lived requests (terminal streams, readiness long-polls) each hold one
+    thread, so keep MANAGER_THREADS well above the number of open admin tabs.
+    """
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        logging.warning("waitress is not installed, using Flask's development server")
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+    
+    waitress_serve(
+        app,
+        host=host,
+        port=port,
+        threads=threads,
+        channel_timeout=MANAGER_KEEPALIVE,
+        connection_limit=MANAGER_CONNECTION_LIMIT,
+        ident='ComfyUI Studio'
+    )
+
 if __name__ == '__main__':
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
     ensure_directories()
-    print("Starting ComfyUI Studio on port 8080...")
-    app.run(host='0.0.0.0', port=8080, debug=False)
\ No newline at end of file
+    threading.Thread(target=warm_manifests, daemon=True).start()
+    threading.Thread(target=output_catalog.run, daemon=True).start()
+    model_tier.reconcile()
+    threading.Thread(target=model_tier.run, daemon=True).start()
+    session_manager.prewarm()
+    threading.Thread(target=idle_monitor.run, daemon=True).start()
+    print(f"Starting ComfyUI Studio on port {MANAGER_PORT} with {MANAGER_THREADS} threads...")
+    serve()
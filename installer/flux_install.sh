@@ -2,6 +2,10 @@
 set -e
 
 MODELS_DIR="/workspace/ComfyUI/models"
+QUARANTINE_DIR="/workspace/.model-quarantine"
+QUARANTINE_KEEP=2
+DOWNLOAD_ATTEMPTS=3
+FAILED=()
 
 # Create directories if they don't exist
 mkdir -p "$MODELS_DIR/diffusion_models"
@@ -9,19 +13,70 @@ mkdir -p "$MODELS_DIR/text_encoders"
 mkdir -p "$MODELS_DIR/clip_vision"
 mkdir -p "$MODELS_DIR/vae"
 
+# Move a bad download aside, keeping only the newest few for inspection
+quarantine() {
+    local path="$1"
+    mkdir -p "$QUARANTINE_DIR"
+    mv "$path" "$QUARANTINE_DIR/$(date +%s)-$(basename "$path")"
+    ls -1t "$QUARANTINE_DIR" | tail -n +$((QUARANTINE_KEEP + 1)) | while read -r old; do
+        rm -f "$QUARANTINE_DIR/$old"
+    done
+}
+
+# Resume a download into a .part file and print the sha256 of the whole file.
+# The bytes already on disk are read once and new bytes are hashed on their way
+# to disk, so a multi-GB file is never read back a second time.
+fetch_hashed() {
+    local url="$1"
+    local part="$2"
+    local offset=0
+    [ -f "$part" ] && offset=$(stat -c %s "$part")
+    set -o pipefail
+    { cat "$part" 2>/dev/null || true; curl -fL -r "$offset-" "$url" | tee -a "$part"; } | sha256sum | cut -d' ' -f1
+}
+
 # Function to download model if it doesn't exist
+# Usage: download_model <url> <dest_dir> [sha256]
+# Downloads go to a .part file that is only moved into place once complete
+# (and verified when a sha256 is given), so an interrupted download is resumed
+# rather than mistaken for a finished file. A file that fails its sha256 is
+# quarantined and fetched again, up to DOWNLOAD_ATTEMPTS times; a model that
+# still fails is recorded in FAILED so the rest of the bundle is installed.
 download_model() {
     local url="$1"
     local dest_dir="$2"
+    local sha256="$3"
     local filename=$(basename "$url")
     local filepath="$dest_dir/$filename"
+    local attempt actual fetched
     
     if [ -f "$filepath" ]; then
         echo "✓ $filename already exists, skipping"
-    else
-        echo "↓ Downloading $filename..."
-        wget -c "$url" -O "$filepath"
+        return 0
     fi
+    for attempt in $(seq 1 "$DOWNLOAD_ATTEMPTS"); do
+        echo "↓ Downloading $filename..."
+        if [ -n "$sha256" ]; then
+            fetched=1
+            actual=$(fetch_hashed "$url" "$filepath.part") || fetched=0
+            # a resume refused because the file was already complete still hashes correctly
+            if [ "$actual" != "${sha256,,}" ]; then
+                if [ "$fetched" = 0 ]; then
+                    echo "✗ Download of $filename failed (attempt $attempt/$DOWNLOAD_ATTEMPTS)"
+                else
+                    echo "✗ $filename does not match its sha256, quarantining it (attempt $attempt/$DOWNLOAD_ATTEMPTS)"
+                    quarantine "$filepath.part"
+                fi
+                continue
+            fi
+        elif ! wget -c "$url" -O "$filepath.part"; then
+            echo "✗ Download of $filename failed (attempt $attempt/$DOWNLOAD_ATTEMPTS)"
+            continue
+        fi
+        mv "$filepath.part" "$filepath"
+        return 0
+    done
+    FAILED+=("$filename")
 }
 
 echo "=== Installing Flux Models ==="
@@ -48,4 +103,9 @@ download_model "https://huggingface.co/Comfy-Org/sigclip_vision_384/resolve/main
 echo "→ VAE"
 download_model "https://huggingface.co/Comfy-Org/Lumina_Image_2.0_Repackaged/resolve/main/split_files/vae/ae.safetensors" "$MODELS_DIR/vae"
 
+if [ ${#FAILED[@]} -gt 0 ]; then
+    echo "✗ Failed to install: ${FAILED[*]}"
+    exit 1
+fi
+
 echo "=== Flux models installation complete ==="
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""ComfyUI readiness: startup banner, backoff probing and health states"""
+import os
+import threading
+import time
+
+import pytest
+
+import enhanced_artist_server as server
+
+
+class FakeProcess:
+    """Stands in for a spawned ComfyUI: lines written to it appear on its stdout"""
+
+    def __init__(self):
+        read_fd, self.write_fd = os.pipe()
+        self.stdout = os.fdopen(read_fd, 'rb')
+        self.pid = 4242
+        self.returncode = None
+
+    def print(self, line):
+        os.write(self.write_fd, line + b'\n')
+
+    def exit(self, code=1):
+        self.returncode = code
+        os.close(self.write_fd)
+
+    def poll(self):
+        return self.returncode
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """Stub API probe and port check that record their calls; the probe answers from probes['ok']"""
+    probes = {'ok': True, 'calls': [], 'port_checks': []}
+
+    def probe(http, port):
+        probes['calls'].append(time.time())
+        return {'ok': probes['ok'], 'latency_ms': 1.0, 'queue_depth': 0}
+
+    def port_open(port):
+        probes['port_checks'].append(time.time())
+        return False
+
+    monkeypatch.setattr(server, 'probe_comfyui', probe)
+    monkeypatch.setattr(server, '_comfyui_port_open', port_open)
+    monkeypatch.setattr(server, 'COMFYUI_PROBE_MIN_DELAY', 0.01)
+    monkeypatch.setattr(server, 'COMFYUI_PROBE_MAX_DELAY', 0.08)
+    monkeypatch.setattr(server, 'COMFYUI_HEALTH_INTERVAL', 0.02)
+    return probes
+
+
+def wait_for_state(monitor, state, timeout=3):
+    deadline = time.time() + timeout
+    while monitor.state != state and time.time() < deadline:
+        time.sleep(0.01)
+    return monitor.state
+
+
+@pytest.fixture
+def started(probes, tmp_path):
+    monitor = server.ComfyUIMonitor(port=1)
+    process = FakeProcess()
+    monitor.watch(process, str(tmp_path / 'comfyui.log'))
+    yield monitor, process
+    monitor.stop()
+    if process.returncode is None:
+        process.exit(0)
+
+
+def test_banner_makes_it_ready(started, probes, tmp_path):
+    monitor, process = started
+    process.print(b'Starting server')
+    time.sleep(0.2)
+    assert monitor.state == 'starting'
+    assert probes['calls'] == []  # the API is not probed before the banner or an open port
+    process.print(b'To see the GUI go to: http://127.0.0.1:8188')
+    assert wait_for_state(monitor, 'ready') == 'ready'
+    assert monitor.status()['startup_seconds'] is not None
+    assert b'Starting server' in (tmp_path / 'comfyui.log').read_bytes()
+
+
+def test_port_checks_back_off(started, probes):
+    time.sleep(0.6)
+    checks = probes['port_checks']
+    gaps = [b - a for a, b in zip(checks, checks[1:])]
+    assert len(checks) < 20  # a fixed 10 ms poll would have made ~60 checks
+    assert gaps[-1] >= 0.06
+
+
+def test_dead_process_is_reported(started):
+    monitor, process = started
+    process.exit(1)
+    assert wait_for_state(monitor, 'exited') == 'exited'
+
+
+def test_failed_health_probes_mark_it_unresponsive(started, probes):
+    monitor, process = started
+    process.print(b'To see the GUI go to: http://127.0.0.1:8188')
+    assert wait_for_state(monitor, 'ready') == 'ready'
+    probes['ok'] = False
+    assert wait_for_state(monitor, 'unresponsive') == 'unresponsive'
+    probes['ok'] = True
+    assert wait_for_state(monitor, 'ready') == 'ready'
+
+
+@pytest.fixture
+def starting_session(monkeypatch):
+    artist_session = server.ArtistSession('stub', 8188, None)
+    with artist_session.monitor.condition:
+        artist_session.monitor._set_state('starting')
+    monkeypatch.setitem(server.session_manager.sessions, 'stub', artist_session)
+    return artist_session
+
+
+def flip_later(monitor, state, delay):
+    def flip():
+        time.sleep(delay)
+        with monitor.condition:
+            monitor._set_state(state)
+    threading.Thread(target=flip, daemon=True).start()
+
+
+def test_long_poll_returns_when_the_state_changes(starting_session):
+    flip_later(starting_session.monitor, 'ready', 0.2)
+    started = time.time()
+    result = server.app.test_client().get('/comfyui_status?wait=5&artist=stub').json
+    assert result['ready'] and result['state'] == 'ready'
+    assert 0.15 < time.time() - started < 2
+
+
+def test_long_poll_returns_at_the_timeout(starting_session):
+    started = time.time()
+    result = server.app.test_client().get('/comfyui_status?wait=0.3&artist=stub').json
+    assert result['state'] == 'starting'
+    assert 0.3 <= time.time() - started < 2
+
+
+def test_long_poll_does_not_hold_settled_states(starting_session):
+    with starting_session.monitor.condition:
+        starting_session.monitor._set_state('exited')
+    started = time.time()
+    result = server.app.test_client().get('/comfyui_status?wait=5&artist=stub').json
+    assert result['state'] == 'exited'
+    assert time.time() - started < 1
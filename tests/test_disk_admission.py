@@ -0,0 +1,56 @@
+"""Disk admission for install jobs"""
+import collections
+import threading
+import time
+
+import pytest
+
+import enhanced_artist_server as server
+
+GB = 10 ** 9
+Usage = collections.namedtuple('Usage', 'total used free')
+
+
+def wait_done(scheduler, job, timeout=5):
+    deadline = time.time() + timeout
+    while job.status in scheduler.ACTIVE and time.time() < deadline:
+        time.sleep(0.02)
+    return job.status
+
+
+@pytest.fixture
+def disk(monkeypatch):
+    disk = {'free': 100 * GB}
+    monkeypatch.setattr(server.shutil, 'disk_usage', lambda path: Usage(200 * GB, 200 * GB - disk['free'], disk['free']))
+    monkeypatch.setattr(server, 'DISK_HEADROOM', 0)
+    monkeypatch.setattr(server, 'COMPONENT_LABELS', dict(server.COMPONENT_LABELS, a='A', b='B'))
+    return disk
+
+
+def test_written_bytes_are_not_also_reserved(disk, monkeypatch):
+    scheduler = server.JobScheduler()
+    monkeypatch.setattr(server, 'job_scheduler', scheduler)
+    writing, finish = threading.Event(), threading.Event()
+
+    def download():
+        disk['free'] -= 50 * GB  # half of what it reserved is now on disk
+        writing.set()
+        finish.wait(5)
+        return True
+
+    first, = scheduler.submit([('a', download, [])], sizes={'a': 100 * GB - 40 * GB})
+    assert writing.wait(5)
+    assert first.admitted
+    # 50 GB free; the first job still needs 10 GB of its 60 GB, so 40 GB is available
+    assert scheduler.reserved_bytes() == 10 * GB
+    second, = scheduler.submit([('b', lambda: True, [])], sizes={'b': 35 * GB})
+    finish.set()
+    assert wait_done(scheduler, second) == 'succeeded', second.error
+
+
+def test_job_that_does_not_fit_is_refused(disk, monkeypatch):
+    scheduler = server.JobScheduler()
+    monkeypatch.setattr(server, 'job_scheduler', scheduler)
+    job, = scheduler.submit([('a', lambda: True, [])], sizes={'a': 150 * GB})
+    assert wait_done(scheduler, job) == 'failed'
+    assert 'needs 150.0 GB' in job.error
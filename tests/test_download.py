@@ -0,0 +1,192 @@
+"""Download engine against a local http.server stand-in for the model hosts"""
+import hashlib
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import enhanced_artist_server as server
+
+DATA = os.urandom(5 * 1024 * 1024 + 123)
+CHUNK = 1024 * 1024
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves DATA, honouring Range unless the server is told not to"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._send(head=True)
+
+    def do_GET(self):
+        self._send()
+
+    def _send(self, head=False):
+        state = self.server.state
+        if not head and state['errors'] > 0:
+            state['errors'] -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if not head:
+            state['requests'].append(self.headers.get('Range'))
+        data, code, start = DATA, 200, 0
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match and state['ranges'] and int(match.group(1)) >= len(DATA):
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(DATA)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if match and state['ranges']:
+            start = int(match.group(1))
+            end = int(match.group(2) or len(DATA) - 1)
+            data, code = DATA[start:end + 1], 206
+        self.send_response(code)
+        if state['length'] or not head:
+            self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', '"v1"')
+        if state['ranges']:
+            self.send_header('Accept-Ranges', 'bytes')
+        if code == 206:
+            self.send_header('Content-Range', f'bytes {start}-{start + len(data) - 1}/{len(DATA)}')
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+
+
+@pytest.fixture
+def host():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.state = {'ranges': True, 'errors': 0, 'requests': [], 'length': True}
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def quarantine(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'QUARANTINE_DIR', str(tmp_path / 'quarantine'))
+    monkeypatch.setattr(server.time, 'sleep', lambda seconds: None)
+    return tmp_path / 'quarantine'
+
+
+def url_for(host):
+    return f'http://127.0.0.1:{host.server_port}/model.bin'
+
+
+def test_ranged_download(host, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    info = server.probe_download(url_for(host))
+    assert info['size'] == len(DATA) and info['ranges']
+    assert server.download_file(url_for(host), dest, chunk_size=CHUNK, chunk_workers=4, info=info) == 'downloaded'
+    assert open(dest, 'rb').read() == DATA
+    assert info['sha256'] == hashlib.sha256(DATA).hexdigest()
+    assert info['resumed'] == 0
+    assert len(host.state['requests']) == 6
+    assert not os.path.exists(dest + '.part')
+
+
+def test_download_without_ranges(host, tmp_path):
+    host.state['ranges'] = False
+    dest = str(tmp_path / 'model.bin')
+    info = server.probe_download(url_for(host))
+    assert not info['ranges']
+    server.download_file(url_for(host), dest, chunk_size=CHUNK, chunk_workers=4, info=info)
+    assert open(dest, 'rb').read() == DATA
+    assert host.state['requests'] == [None]
+
+
+def test_resume_from_partial_file(host, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    with open(dest + '.part', 'wb') as f:
+        f.write(DATA[:CHUNK + 17])
+    fetched = []
+    info = server.probe_download(url_for(host))
+    server.download_file(url_for(host), dest, chunk_size=len(DATA), chunk_workers=1,
+                         progress=fetched.append, info=info, sha256=hashlib.sha256(DATA).hexdigest())
+    assert open(dest, 'rb').read() == DATA
+    assert host.state['requests'] == [f'bytes={CHUNK + 17}-']
+    assert fetched[0] == CHUNK + 17
+    assert info['resumed'] == CHUNK + 17
+
+
+def test_resume_ranged_chunks(host, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    info = server.probe_download(url_for(host))
+    with open(dest + '.part', 'wb') as f:
+        f.write(DATA[:2 * CHUNK])
+        f.truncate(len(DATA))
+    server._save_part_state(dest + '.part.json', info, CHUNK, {0, 1})
+    server.download_file(url_for(host), dest, chunk_size=CHUNK, chunk_workers=4, info=info)
+    assert open(dest, 'rb').read() == DATA
+    assert f'bytes=0-{CHUNK - 1}' not in host.state['requests']
+    assert len(host.state['requests']) == 4
+    assert info['resumed'] == 2 * CHUNK
+
+
+def test_sha256_mismatch_is_quarantined(host, tmp_path, quarantine):
+    dest = str(tmp_path / 'model.bin')
+    with pytest.raises(server.IntegrityError):
+        server.download_file(url_for(host), dest, chunk_size=CHUNK, chunk_workers=4, sha256='0' * 64)
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + '.part')
+    assert len(os.listdir(quarantine)) >= 1
+
+
+def test_quarantine_prunes_by_quarantine_time(tmp_path, quarantine, monkeypatch):
+    monkeypatch.setattr(server, 'QUARANTINE_KEEP', 1)
+    os.makedirs(quarantine / 'inspect')
+    older = quarantine / 'older.bin'
+    older.write_bytes(b'x')
+    os.utime(older, (time.time() - 100, time.time() - 100))
+    path = tmp_path / 'model.bin'
+    path.write_bytes(b'x')
+    # the download itself is older than anything already in quarantine
+    os.utime(path, (1000, 1000))
+    target = server.quarantine_model_file(str(path), 'test')
+    assert sorted(os.listdir(quarantine)) == sorted(['inspect', os.path.basename(target)])
+
+
+def test_server_error_on_ranged_get(host, tmp_path):
+    host.state['errors'] = 100
+    dest = str(tmp_path / 'model.bin')
+    info = server.probe_download(url_for(host))
+    with pytest.raises(server.DownloadError, match='server error'):
+        server.download_file(url_for(host), dest, chunk_size=CHUNK, chunk_workers=4, info=info)
+
+
+def test_transient_server_error_is_retried(host, tmp_path):
+    host.state['errors'] = 2
+    dest = str(tmp_path / 'model.bin')
+    info = server.probe_download(url_for(host))
+    server.download_file(url_for(host), dest, chunk_size=CHUNK, chunk_workers=4, info=info)
+    assert open(dest, 'rb').read() == DATA
+
+
+def test_oversized_partial_file_is_restarted(host, tmp_path):
+    dest = str(tmp_path / 'model.bin')
+    with open(dest + '.part', 'wb') as f:
+        f.write(os.urandom(len(DATA) + 10))
+    server.download_file(url_for(host), dest, chunk_size=len(DATA), chunk_workers=1)
+    assert open(dest, 'rb').read() == DATA
+    assert host.state['requests'] == [None]
+
+
+def test_unsatisfiable_resume_range_is_restarted(host, tmp_path):
+    host.state['length'] = False  # size unknown up front, so only the 416 tells
+    dest = str(tmp_path / 'model.bin')
+    with open(dest + '.part', 'wb') as f:
+        f.write(os.urandom(len(DATA) + 10))
+    info = server.probe_download(url_for(host))
+    assert info['size'] is None
+    server.download_file(url_for(host), dest, chunk_size=len(DATA), chunk_workers=1, info=info)
+    assert open(dest, 'rb').read() == DATA
+    assert host.state['requests'] == [f'bytes={len(DATA) + 10}-', None]
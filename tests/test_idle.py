@@ -0,0 +1,122 @@
+"""Idle shutdown against stand-ins for Jupyter's and ComfyUI's HTTP APIs"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import enhanced_artist_server as server
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Answers /api/kernels and /api/status like Jupyter, /history like ComfyUI"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path.startswith('/api/kernels'):
+            body = [{'execution_state': 'busy' if state['busy'] else 'idle'}]
+        elif self.path.startswith('/api/status'):
+            body = {'last_activity': state['last_activity']}
+        else:
+            body = {state['prompt']: {}} if state['prompt'] else {}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def standin():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.state = {'busy': False, 'last_activity': '2026-01-01T00:00:00Z', 'prompt': None}
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def monitor(standin, monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, 'cleanup_processes', lambda: calls.append('cleanup'))
+    monkeypatch.setattr(server.session_manager, 'list', lambda: [])
+    idle = server.IdleMonitor(timeout=100, warning=20, jupyter_url=f'http://127.0.0.1:{standin.server_port}',
+                              stop_command='true')
+    idle.cleanup_calls = calls
+    return idle
+
+
+def running_session(artist, port):
+    artist_session = server.ArtistSession(artist, port, None)
+    artist_session.process = types.SimpleNamespace(pid=1, poll=lambda: None)
+    return artist_session
+
+
+def test_disabled_by_default():
+    # the default is read at import, so check it in a fresh interpreter without IDLE_TIMEOUT set
+    env = {k: v for k, v in os.environ.items() if k != 'IDLE_TIMEOUT'}
+    result = subprocess.run(
+        [sys.executable, '-c', 'import enhanced_artist_server as s; print(s.IDLE_TIMEOUT, s.idle_monitor.state)'],
+        cwd=os.path.dirname(server.__file__), env=env, capture_output=True, text=True, timeout=60)
+    assert result.stdout.split() == ['0', 'disabled']
+
+
+def test_warns_then_stops(monitor):
+    assert monitor.sample() is None  # the first sample only records marks
+    start = monitor.last_activity
+    assert monitor.check(start + 50) == 'active'
+    assert monitor.check(start + 85) == 'warning'
+    assert monitor.cleanup_calls == []
+    assert monitor.check(start + 101) == 'stopped'
+    assert monitor.cleanup_calls == ['cleanup']
+
+
+def test_jupyter_activity_resets_the_window(monitor, standin):
+    monitor.sample()
+    monitor.check(monitor.last_activity + 85)
+    assert monitor.status()['state'] == 'warning'
+    standin.state['last_activity'] = '2026-01-01T00:05:00Z'
+    assert monitor.sample() == 'Jupyter was used'
+    assert monitor.status()['state'] == 'active'
+    standin.state['busy'] = True
+    assert monitor.sample() == 'a Jupyter kernel is busy'
+
+
+def test_finished_comfyui_prompt_counts_as_activity(monitor, standin, monkeypatch):
+    artist_session = running_session('ana', standin.server_port)
+    monkeypatch.setattr(server.session_manager, 'list', lambda: [artist_session])
+    monitor.sample()
+    standin.state['prompt'] = 'prompt-1'
+    assert monitor.sample() == 'ana finished a prompt'
+    assert monitor.sample() is None
+
+
+def test_reused_port_is_not_mistaken_for_activity(monitor, standin, monkeypatch):
+    ana = running_session('ana', standin.server_port)
+    monkeypatch.setattr(server.session_manager, 'list', lambda: [ana])
+    standin.state['prompt'] = 'ana-prompt'
+    monitor.sample()
+    monitor.forget(ana)
+    ben = running_session('ben', standin.server_port)
+    monkeypatch.setattr(server.session_manager, 'list', lambda: [ben])
+    standin.state['prompt'] = 'ben-old-prompt'
+    assert monitor.sample() is None  # the first look at ben's ComfyUI only records a mark
+
+
+def test_keepalive_route(monitor, monkeypatch):
+    monkeypatch.setattr(server, 'idle_monitor', monitor)
+    monitor.check(monitor.last_activity + 85)
+    client = server.app.test_client()
+    assert client.get('/idle_status').json['state'] == 'warning'
+    result = client.post('/idle_status/keepalive').json
+    assert result['state'] == 'active'
+    assert result['last_reason'] == 'keep-alive from the UI'
@@ -0,0 +1,27 @@
+"""Content-addressed model store"""
+import os
+
+import enhanced_artist_server as server
+
+
+def test_bundle_downloads_are_linked_into_the_store(tmp_path, monkeypatch):
+    models_dir = tmp_path / 'models'
+    monkeypatch.setattr(server, 'MODELS_DIR', str(models_dir))
+    monkeypatch.setattr(server, 'BLOB_STORE_DIR', str(tmp_path / 'store'))
+    monkeypatch.setattr(server, 'BLOB_STORE_MIN_SIZE', 1)
+    monkeypatch.setattr(server, 'fetch_manifest', lambda script: '')
+    monkeypatch.setattr(server, 'parse_models_from_script', lambda text: [
+        {'dest_dir': str(models_dir / 'vae')}, {'dest_dir': str(models_dir / 'loras')}])
+    payload = os.urandom(4096)
+    for folder in ('vae', 'loras'):
+        os.makedirs(models_dir / folder)
+        (models_dir / folder / 'same.safetensors').write_bytes(payload)
+    (models_dir / 'loras' / 'other.safetensors').write_bytes(os.urandom(4096))
+
+    assert server.store_catalog_models() == 3
+    vae = os.stat(models_dir / 'vae' / 'same.safetensors')
+    lora = os.stat(models_dir / 'loras' / 'same.safetensors')
+    assert vae.st_ino == lora.st_ino
+    stats = server.model_store_stats()
+    assert stats['blobs'] == 2
+    assert stats['bytes_saved'] == 4096
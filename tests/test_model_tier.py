@@ -0,0 +1,82 @@
+"""Local model tier budget accounting"""
+import os
+import threading
+
+import pytest
+
+import enhanced_artist_server as server
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'MODELS_DIR', str(tmp_path / 'models'))
+    monkeypatch.setattr(server, 'BLOB_STORE_DIR', str(tmp_path / 'store'))
+    monkeypatch.setattr(server, 'BLOB_STORE_MIN_SIZE', 1)
+    monkeypatch.setattr(server, 'TIER_MIN_FREE', 0)
+    os.makedirs(tmp_path / 'models' / 'loras')
+    paths = []
+    for name in ('a', 'b', 'c'):
+        path = str(tmp_path / 'models' / 'loras' / f'{name}.bin')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(3000))
+        paths.append(path)
+    return paths
+
+
+def test_concurrent_promotions_stay_within_budget(models, tmp_path):
+    tier = server.ModelTier(str(tmp_path / 'tier'), budget=7000)
+    os.makedirs(tier.tier_dir)
+    barrier = threading.Barrier(len(models))
+    results = {}
+
+    def promote(path):
+        barrier.wait()
+        results[path] = tier.promote(path, evict=False)
+
+    threads = [threading.Thread(target=promote, args=(path,)) for path in models]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(results.values()) == 2
+    assert tier.used_bytes() == 6000
+    assert tier.copying == {}
+
+
+def test_promote_without_evict_keeps_existing_copies(models, tmp_path):
+    a, b, c = models
+    tier = server.ModelTier(str(tmp_path / 'tier'), budget=7000)
+    os.makedirs(tier.tier_dir)
+    assert tier.promote(a) and tier.promote(b)
+    assert not tier.promote(c, evict=False)
+    assert set(tier.entries) == {a, b}
+    assert tier.promote(c)
+    assert len(tier.entries) == 2 and c in tier.entries
+
+
+def test_eviction_copy_runs_outside_the_lock(models, tmp_path, monkeypatch):
+    a, b, c = models
+    tier = server.ModelTier(str(tmp_path / 'tier'), budget=7000)
+    os.makedirs(tier.tier_dir)
+    assert tier.promote(a) and tier.promote(b)
+    # a victim missing from the blob store is copied back to the volume first
+    sha256 = tier.entries[a]['sha256']
+    os.remove(server.blob_path(sha256))
+    copyfile = server.shutil.copyfile
+    during_copy = {}
+
+    def slow_copyfile(src, dst):
+        status = []
+        reader = threading.Thread(target=lambda: status.append(tier.status()))
+        reader.start()
+        reader.join(timeout=2)
+        during_copy['status'] = list(status)
+        return copyfile(src, dst)
+
+    monkeypatch.setattr(server.shutil, 'copyfile', slow_copyfile)
+    assert tier.promote(c)
+    assert len(during_copy['status']) == 1
+    # the victim still counts against the budget until its local copy is gone
+    assert during_copy['status'][0]['used_bytes'] == 9000
+    assert set(tier.entries) == {b, c} and tier.evicting == {}
+    assert os.path.samefile(a, server.blob_path(sha256))
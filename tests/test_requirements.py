@@ -0,0 +1,28 @@
+"""Merging custom node requirements into one pip resolve"""
+import enhanced_artist_server as server
+
+
+def write_node(root, folder, requirements):
+    (root / folder).mkdir()
+    (root / folder / 'requirements.txt').write_text(requirements)
+    return {'name': folder, 'folder_name': folder}
+
+
+def test_unsatisfiable_ranges_are_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'CUSTOM_NODES_DIR', str(tmp_path))
+    nodes = [
+        write_node(tmp_path, 'a', 'torch>=2.1\nnumpy<2\nopencv-python\n'),
+        write_node(tmp_path, 'b', 'torch<2.0\nnumpy>=1.24\nopencv_python>=4.8\n'),
+    ]
+    lines, conflicts = server.merge_node_requirements(nodes)
+    assert set(conflicts) == {'torch'}
+    assert conflicts['torch'] == {'a': '>=2.1', 'b': '<2.0'}
+    assert 'numpy<2,>=1.24' in lines
+    assert 'opencv-python>=4.8' in lines
+
+
+def test_specifiers_satisfiable():
+    assert server.specifiers_satisfiable(['>1.0', '<1.1'])
+    assert server.specifiers_satisfiable(['==1.2.*', '!=1.2.0'])
+    assert not server.specifiers_satisfiable(['==1.0', '==2.0'])
+    assert not server.specifiers_satisfiable(['~=1.4.2', '>=1.5'])
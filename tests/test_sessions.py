@@ -0,0 +1,121 @@
+"""Per-artist ComfyUI sessions: ports, stopping and pre-warming"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import enhanced_artist_server as server
+
+# exits a moment after SIGTERM, like a ComfyUI finishing its shutdown
+SLOW_EXIT = (
+    "import signal, sys, time\n"
+    "signal.signal(signal.SIGTERM, lambda *a: (time.sleep(0.5), sys.exit(0)))\n"
+    "time.sleep(60)\n"
+)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'STATUS_DIR', str(tmp_path / 'status'))
+    monkeypatch.setattr(server, 'OUTPUT_DIR', str(tmp_path / 'output'))
+    monkeypatch.setattr(server, 'OUTPUT_LINK_DIR', str(tmp_path / 'status' / 'outputs'))
+    monkeypatch.setattr(server, 'COMFYUI_MAX_SESSIONS', 2)
+    manager = server.SessionManager()
+    manager._gpus = []
+    yield manager
+    manager.stop_all()
+
+
+def test_stopping_session_keeps_its_port_until_it_exits(manager, monkeypatch):
+    monkeypatch.setattr(server, 'spawn_comfyui',
+                        lambda port, output_dir, gpu=None: subprocess.Popen([sys.executable, '-c', SLOW_EXIT]))
+    monkeypatch.setattr(server.ComfyUIMonitor, 'watch', lambda self, process, log_path: None)
+    first, _ = manager.start('ana')
+    time.sleep(0.2)  # let the stub install its SIGTERM handler
+    stopper = threading.Thread(target=manager.stop, args=('ana', False))
+    stopper.start()
+    time.sleep(0.1)
+    second, _ = manager.start('ben')
+    assert first.process.poll() is None  # still shutting down
+    assert second.port != first.port
+    stopper.join()
+    assert manager.stopping == []
+
+
+# a stand-in for ComfyUI's main.py: prints the startup banner and serves the probe endpoint
+STUB_MAIN = '''
+import argparse, json
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--listen')
+parser.add_argument('--port', type=int)
+parser.add_argument('--output-directory')
+args = parser.parse_args()
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        data = json.dumps({'exec_info': {'queue_remaining': 0}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+httpd = HTTPServer(('127.0.0.1', args.port), Handler)
+print('To see the GUI go to: http://127.0.0.1:%d' % args.port, flush=True)
+httpd.serve_forever()
+'''
+
+
+@pytest.fixture
+def stub_comfyui(manager, tmp_path, monkeypatch):
+    comfyui_dir = tmp_path / 'ComfyUI'
+    (comfyui_dir / '.venv' / 'bin').mkdir(parents=True)
+    (comfyui_dir / '.venv' / 'bin' / 'python').symlink_to(sys.executable)
+    (comfyui_dir / 'main.py').write_text(STUB_MAIN)
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    monkeypatch.setattr(server, 'COMFYUI_DIR', str(comfyui_dir))
+    monkeypatch.setattr(server, 'COMFYUI_PORT', port)
+    monkeypatch.setattr(server, 'COMFYUI_MAX_SESSIONS', 1)
+    monkeypatch.setattr(server, 'COMFYUI_PREWARM', True)
+    return manager
+
+
+def wait_ready(artist_session, timeout=10):
+    artist_session.monitor.wait(timeout)
+    return artist_session.monitor.state
+
+
+def test_start_adopts_the_prewarmed_comfyui(stub_comfyui, tmp_path):
+    warm = stub_comfyui.prewarm()
+    assert warm is not None and wait_ready(warm) == 'ready'
+    session, started = stub_comfyui.start('ana')
+    assert started
+    assert session is warm and session.artist == 'ana'
+    assert stub_comfyui.warm is None
+    link = os.path.join(server.OUTPUT_LINK_DIR, f'comfyui-{session.port}')
+    assert os.readlink(link) == os.path.join(server.OUTPUT_DIR, 'ana')
+    assert session.monitor.status()['ready']
+
+
+def test_start_falls_back_to_a_cold_start(stub_comfyui):
+    warm = stub_comfyui.prewarm()
+    assert wait_ready(warm) == 'ready'
+    warm.process.kill()
+    warm.process.wait()
+    session, started = stub_comfyui.start('ben')
+    assert started
+    assert session is not warm and session.process.pid != warm.process.pid
+    assert session.port == warm.port  # the dead warm instance's slot is reused
+    assert wait_ready(session) == 'ready'
+    link = os.path.join(server.OUTPUT_LINK_DIR, f'comfyui-{session.port}')
+    assert os.readlink(link) == os.path.join(server.OUTPUT_DIR, 'ben')
@@ -0,0 +1,60 @@
+"""Thumbnail rendering for artist outputs"""
+import os
+import warnings
+
+import pytest
+
+import enhanced_artist_server as server
+
+Image = pytest.importorskip('PIL.Image')
+ImageFile = pytest.importorskip('PIL.ImageFile')
+
+
+@pytest.fixture
+def outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'OUTPUT_DIR', str(tmp_path / 'output'))
+    monkeypatch.setattr(server, 'thumbnail_cache', server.ThumbnailCache(str(tmp_path / 'thumbs')))
+    os.makedirs(tmp_path / 'output' / 'ana')
+    Image.new('RGB', (600, 400), 'red').save(tmp_path / 'output' / 'ana' / 'a.png')
+    return tmp_path
+
+
+def test_thumbnail_is_rendered_and_cached(outputs):
+    client = server.app.test_client()
+    response = client.get('/api/artists/ana/thumbnails/a.png?size=256&format=jpeg')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    again = client.get('/api/artists/ana/thumbnails/a.png?size=256&format=jpeg',
+                       headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_decompression_bomb_is_rejected(outputs, monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    response = server.app.test_client().get('/api/artists/ana/thumbnails/a.png?format=jpeg')
+    assert response.status_code == 422
+    leftovers = [name for _, _, names in os.walk(outputs / 'thumbs') for name in names]
+    assert leftovers == []
+
+
+def test_image_past_the_pixel_limit_is_not_decoded(outputs, monkeypatch):
+    # 240000 pixels is between one and two times the limit, where Pillow only warns
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 150000)
+    monkeypatch.setattr(ImageFile.ImageFile, 'load', lambda self: pytest.fail('decoded an oversized image'))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        response = server.app.test_client().get('/api/artists/ana/thumbnails/a.png?format=jpeg')
+    assert response.status_code == 422
+    assert 'too large' in response.json['message']
+
+
+def test_failed_save_leaves_no_temp_file(outputs, monkeypatch):
+    def broken_save(self, fp, *args, **kwargs):
+        with open(fp, 'wb') as f:
+            f.write(b'partial')
+        raise OSError('disk full')
+    monkeypatch.setattr(Image.Image, 'save', broken_save)
+    response = server.app.test_client().get('/api/artists/ana/thumbnails/a.png?format=jpeg')
+    assert response.status_code == 422
+    leftovers = [name for _, _, names in os.walk(outputs / 'thumbs') for name in names]
+    assert leftovers == []